@@ -36,4 +36,4 @@ def classFactory(iface):  # pylint: disable=invalid-name
     """
     #
     from .three_toolbox import ThreeToolboxPlugin
-    return ThreeToolboxPlugin()
+    return ThreeToolboxPlugin(iface)
@@ -0,0 +1,8 @@
+"""Benchmarks of the plugin.
+
+They are not part of the test suite and are run as modules from the folder
+that contains the plugin, with the Python interpreter of QGIS, e.g.
+
+    python -m three_toolbox.benchmarks.startup --repeat 5
+    python -m three_toolbox.benchmarks.suite --count 500 --output results.json
+"""
@@ -0,0 +1,160 @@
+"""Deterministic generators of synthetic 3D buildings.
+
+Every generator takes a `numpy.random.Generator` and returns the faces of
+one building as a list of rings (lists of (x, y, z) points, not closed, with
+the normals pointing outwards). `synthetic_buildings` places many of them on
+a grid and encodes them as MultiPolygonZ WKB, so the same seed always gives
+the same layer.
+"""
+
+import numpy as np
+
+from ..core.wkb import encode_multipolygon
+
+KINDS = ("lod1", "lod2", "open", "freeform")
+"""The kinds of buildings: LoD1 prisms, LoD2 gabled houses, gabled houses
+without one roof plane (i.e. with a hole) and free-form shells"""
+
+# The corner of the grid the buildings are placed on, far from the origin
+# like in a projected CRS
+ORIGIN = (85000.0, 445000.0, 0.0)
+
+# The distance between the buildings of the grid
+SPACING = 50.0
+
+def extrude(footprint, bottom, top):
+    """Returns the faces of a prism over a counter-clockwise footprint"""
+    footprint = [tuple(point) for point in footprint]
+    n = len(footprint)
+
+    faces = [[(x, y, bottom) for x, y in reversed(footprint)],
+             [(x, y, top) for x, y in footprint]]
+    for i in range(n):
+        (x0, y0), (x1, y1) = footprint[i], footprint[(i + 1) % n]
+        faces.append([(x0, y0, bottom), (x1, y1, bottom),
+                      (x1, y1, top), (x0, y0, top)])
+
+    return faces
+
+def lod1_prism(rng, resolution=None):
+    """Returns an LoD1 building, i.e. a star-shaped footprint with 4 to 12
+    corners extruded to a single height"""
+    n = int(rng.integers(4, 13))
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n))
+    radii = rng.uniform(6.0, 10.0, n)
+    footprint = np.column_stack([radii * np.cos(angles), radii * np.sin(angles)])
+
+    return extrude(footprint, 0.0, float(rng.uniform(3.0, 30.0)))
+
+def lod2_gabled(rng, resolution=None):
+    """Returns an LoD2 building, i.e. a rectangular house with a gabled
+    roof"""
+    w, d = rng.uniform(6.0, 15.0, 2)
+    h, r = rng.uniform(3.0, 9.0), rng.uniform(1.5, 5.0)
+    w, d, h, r = float(w), float(d), float(h), float(r)
+
+    return [
+        [(0, 0, 0), (0, d, 0), (w, d, 0), (w, 0, 0)],
+        [(0, 0, 0), (w, 0, 0), (w, 0, h), (0, 0, h)],
+        [(w, d, 0), (0, d, 0), (0, d, h), (w, d, h)],
+        [(w, 0, 0), (w, d, 0), (w, d, h), (w, d / 2, h + r), (w, 0, h)],
+        [(0, d, 0), (0, 0, 0), (0, 0, h), (0, d / 2, h + r), (0, d, h)],
+        [(0, 0, h), (w, 0, h), (w, d / 2, h + r), (0, d / 2, h + r)],
+        [(w, d, h), (0, d, h), (0, d / 2, h + r), (w, d / 2, h + r)],
+    ]
+
+def open_gabled(rng, resolution=None):
+    """Returns an LoD2 building without its southern roof plane, so it has a
+    single hole"""
+    faces = lod2_gabled(rng)
+
+    return faces[:5] + faces[6:]
+
+def freeform_shell(rng, resolution=32):
+    """Returns a closed, triangulated free-form shell: a sphere with
+    `resolution` parallels and meridians and a wavy radius. The faces are
+    returned as an (N, 3, 3) array."""
+    phase = rng.uniform(0, 2 * np.pi, 2)
+    radius = rng.uniform(5.0, 10.0)
+
+    theta = np.linspace(0, np.pi, resolution + 1)[:, None]
+    phi = np.linspace(0, 2 * np.pi, resolution + 1)[None, :-1]
+    r = radius * (1 + 0.1 * np.sin(3 * theta + phase[0]) * np.cos(2 * phi + phase[1]))
+    grid = np.stack([r * np.sin(theta) * np.cos(phi),
+                     r * np.sin(theta) * np.sin(phi),
+                     r * np.cos(theta) + radius * 1.2], axis=-1)
+
+    # The points of the grid, then the north and the south pole
+    points = np.concatenate([grid[1:-1].reshape(-1, 3),
+                             [grid[0, 0], grid[-1, 0]]])
+    north, south = len(points) - 2, len(points) - 1
+
+    i, j = np.meshgrid(np.arange(resolution - 2), np.arange(resolution),
+                       indexing="ij")
+    a = i * resolution + j
+    b = i * resolution + (j + 1) % resolution
+    c, d = a + resolution, b + resolution
+
+    first = np.arange(resolution)
+    last = (resolution - 2) * resolution + first
+    triangles = np.concatenate([
+        np.column_stack([np.full(resolution, north), first,
+                         (first + 1) % resolution]),
+        np.column_stack([last, np.full(resolution, south),
+                         last - first + (first + 1) % resolution]),
+        np.stack([a, c, d], axis=-1).reshape(-1, 3),
+        np.stack([a, d, b], axis=-1).reshape(-1, 3),
+    ])
+
+    return points[triangles]
+
+GENERATORS = {
+    "lod1": lod1_prism,
+    "lod2": lod2_gabled,
+    "open": open_gabled,
+    "freeform": freeform_shell,
+}
+
+def synthetic_buildings(count, kind, seed=0, resolution=32) -> list:
+    """Returns the WKB of `count` buildings of a kind (see `KINDS`).
+
+    Parameters
+    ----------
+    count : int
+        The number of buildings
+    kind : str
+        The kind of the buildings
+    seed : int, optional
+        The seed of the random generator, by default 0
+    resolution : int, optional
+        The number of parallels and meridians of free-form shells, by
+        default 32 (i.e. about 2000 triangles)
+
+    Returns
+    -------
+    list
+        The MultiPolygonZ WKB of every building
+    """
+    rng = np.random.default_rng(seed)
+    generator = GENERATORS[kind]
+    columns = max(int(np.ceil(np.sqrt(count))), 1)
+
+    wkbs = []
+    for i in range(count):
+        corner = np.add(ORIGIN, (SPACING * (i % columns),
+                                 SPACING * (i // columns), 0.0))
+        faces = generator(rng, resolution)
+
+        offsets = np.zeros(len(faces) + 1, dtype=np.int64)
+        if isinstance(faces, np.ndarray):
+            # Faces of the same size, e.g. triangles
+            offsets[1:] = faces.shape[1]
+            np.cumsum(offsets, out=offsets)
+            points = faces.reshape(-1, 3)
+        else:
+            np.cumsum([len(face) for face in faces], out=offsets[1:])
+            points = np.concatenate([np.asarray(face, dtype=np.float64)
+                                     for face in faces])
+        wkbs.append(encode_multipolygon(points + corner, offsets))
+
+    return wkbs
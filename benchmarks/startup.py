@@ -0,0 +1,98 @@
+"""Measures the cost of loading the plugin.
+
+Every run starts a fresh interpreter, so nothing is cached from earlier
+runs, and times the import of the plugin module, the creation of the plugin
+and its `initProcessing` and `initGui` calls. It also reports whether
+pyvista was imported on the way, which should not happen since the plugin
+only imports it when a mesh needs it.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PACKAGE = __package__.rpartition(".")[0]
+
+# The script run by every fresh interpreter. It prints its timings as JSON.
+CHILD = """
+import json, sys, time
+
+from qgis.core import QgsApplication
+
+app = QgsApplication([], False)
+app.initQgis()
+
+timings = {{}}
+
+start = time.perf_counter()
+import {package}.three_toolbox as module
+timings["import"] = time.perf_counter() - start
+
+start = time.perf_counter()
+plugin = module.ThreeToolboxPlugin()
+plugin.initProcessing()
+timings["initProcessing"] = time.perf_counter() - start
+
+start = time.perf_counter()
+plugin.initGui()
+timings["initGui"] = time.perf_counter() - start
+
+plugin.unload()
+
+timings["pyvista_imported"] = "pyvista" in sys.modules
+print(json.dumps(timings))
+"""
+
+def run_once(python) -> dict:
+    """Loads the plugin in a fresh interpreter and returns its timings"""
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(
+        [path for path in sys.path if path] +
+        [environment.get("PYTHONPATH", "")])
+
+    output = subprocess.check_output(
+        [python, "-c", CHILD.format(package=PACKAGE)], env=environment)
+
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+def measure(repeat=5, python=sys.executable) -> dict:
+    """Returns the minimum and the median of every timing over `repeat`
+    runs, in seconds"""
+    runs = [run_once(python) for _ in range(repeat)]
+
+    results = {}
+    for stage in ("import", "initProcessing", "initGui"):
+        values = [run[stage] for run in runs]
+        results[stage] = {
+            "min": min(values),
+            "median": statistics.median(values),
+        }
+    results["pyvista_imported"] = any(run["pyvista_imported"] for run in runs)
+
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="the number of fresh interpreters to start")
+    parser.add_argument("--python", default=sys.executable,
+                        help="the Python interpreter of QGIS")
+    parser.add_argument("--output", help="a JSON file to write the results to")
+    args = parser.parse_args()
+
+    results = measure(args.repeat, args.python)
+
+    for stage in ("import", "initProcessing", "initGui"):
+        print("{:<16}{:>10.1f} ms (median {:.1f} ms)".format(
+            stage, results[stage]["min"] * 1000, results[stage]["median"] * 1000))
+    print("pyvista imported: {}".format(results["pyvista_imported"]))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Times the meshes and the algorithms of the plugin on synthetic buildings.
+
+Every stage runs over the same deterministic layers (see `generators`), so
+the JSON results of different runs (e.g. of different commits) can be
+compared with `--baseline`. The stages run on freshly created meshes, so
+their times include decoding the geometries, except for `clean`, which
+only times welding already decoded meshes.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+from importlib.util import find_spec
+
+import numpy as np
+from qgis.core import (Qgis,
+                       QgsApplication,
+                       QgsFeature,
+                       QgsGeometry,
+                       QgsProcessing,
+                       QgsProcessingContext,
+                       QgsProcessingFeedback,
+                       QgsVectorLayer)
+
+from ..core.mesh import Mesh
+from .generators import KINDS, synthetic_buildings
+
+def geometries(wkbs) -> list:
+    """Returns the QgsGeometry objects of WKB geometries"""
+    result = []
+    for wkb in wkbs:
+        geometry = QgsGeometry()
+        geometry.fromWkb(wkb)
+        result.append(geometry)
+
+    return result
+
+def time_geom_to_polydata(geometries, tolerance):
+    """Times the conversion of the geometries to PolyData"""
+    mesh = Mesh(geometries[0])
+
+    start = time.perf_counter()
+    for geometry in geometries:
+        mesh.geom_to_polydata(geometry)
+
+    return time.perf_counter() - start
+
+def time_clean(geometries, tolerance):
+    """Times welding the vertices of already decoded meshes"""
+    meshes = [Mesh(geometry) for geometry in geometries]
+    for mesh in meshes:
+        mesh.origin()
+
+    start = time.perf_counter()
+    for mesh in meshes:
+        mesh.clean(tolerance)
+        mesh.connectivity()
+
+    return time.perf_counter() - start
+
+def timer(method):
+    """Returns a function that times calling `method` on fresh meshes"""
+    def time_method(geometries, tolerance):
+        meshes = [Mesh(geometry, tolerance) for geometry in geometries]
+
+        start = time.perf_counter()
+        for mesh in meshes:
+            getattr(mesh, method)()
+
+        return time.perf_counter() - start
+
+    return time_method
+
+STAGES = {
+    "geom_to_polydata": time_geom_to_polydata,
+    "clean": time_clean,
+    "volume": timer("volume"),
+    "area": timer("area"),
+    "slopes": timer("slopes"),
+    "getHoles": timer("getHoles"),
+}
+
+def memory_layer(geometries) -> QgsVectorLayer:
+    """Returns a memory layer with the given geometries"""
+    layer = QgsVectorLayer("MultiPolygonZ?crs=EPSG:28992", "buildings", "memory")
+
+    features = []
+    for geometry in geometries:
+        feature = QgsFeature()
+        feature.setGeometry(geometry)
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+
+    return layer
+
+def time_algorithm(layer, workers) -> float:
+    """Returns the time of a run of Compute volume over a layer"""
+    from ..processing.analysis.compute_volume_algorithm import ComputeVolumeAlgorithm
+
+    algorithm = ComputeVolumeAlgorithm()
+    algorithm.initAlgorithm({})
+    parameters = {
+        algorithm.INPUT: layer,
+        algorithm.OUTPUT: QgsProcessing.TEMPORARY_OUTPUT,
+        algorithm.WORKERS: workers,
+    }
+
+    start = time.perf_counter()
+    _, ok = algorithm.run(parameters, QgsProcessingContext(),
+                          QgsProcessingFeedback())
+    elapsed = time.perf_counter() - start
+
+    if not ok:
+        raise RuntimeError("Compute volume failed")
+
+    return elapsed
+
+def summary(times, count) -> dict:
+    """Returns the best and the median time of the repetitions of a stage"""
+    return {
+        "seconds": min(times),
+        "median_seconds": float(np.median(times)),
+        "per_feature_ms": 1000 * min(times) / count,
+    }
+
+def revision():
+    """Returns the git revision of the plugin, if it is a git checkout"""
+    try:
+        output = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return output.decode().strip()
+
+def run(count=200, kinds=KINDS, stages=tuple(STAGES), repeat=3, seed=0,
+        resolution=32, tolerance=None, workers=(1,)) -> dict:
+    """Runs the benchmarks and returns their results.
+
+    Parameters
+    ----------
+    count : int, optional
+        The number of buildings of every kind, by default 200
+    kinds : tuple, optional
+        The kinds of buildings (see `generators.KINDS`), by default all
+    stages : tuple, optional
+        The stages to time (see `STAGES`), by default all
+    repeat : int, optional
+        The number of times every stage runs, by default 3
+    seed : int, optional
+        The seed of the generator, by default 0
+    resolution : int, optional
+        The resolution of the free-form shells, by default 32
+    tolerance : float, optional
+        The tolerance used to weld the vertices, by default None
+    workers : tuple, optional
+        The numbers of worker processes to run Compute volume with, by
+        default only 1. An empty tuple skips the algorithm.
+    """
+    if find_spec("pyvista") is None:
+        stages = [stage for stage in stages if stage != "geom_to_polydata"]
+
+    results = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "qgis": Qgis.QGIS_VERSION,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parameters": {
+            "count": count,
+            "repeat": repeat,
+            "seed": seed,
+            "resolution": resolution,
+            "tolerance": tolerance,
+        },
+        "stages": {},
+        "algorithm": {},
+    }
+
+    for kind in kinds:
+        layer = geometries(synthetic_buildings(count, kind, seed, resolution))
+
+        results["stages"][kind] = {
+            stage: summary([STAGES[stage](layer, tolerance)
+                            for _ in range(repeat)], count)
+            for stage in stages
+        }
+
+        if workers:
+            source = memory_layer(layer)
+            results["algorithm"][kind] = {
+                str(n): summary([time_algorithm(source, n)
+                                 for _ in range(repeat)], count)
+                for n in workers
+            }
+
+    return results
+
+def rows(results):
+    """Yields the kind, the name and the summary of every timing"""
+    for kind, stages in results["stages"].items():
+        for stage, timing in stages.items():
+            yield kind, stage, timing
+
+    for kind, runs in results["algorithm"].items():
+        for workers, timing in runs.items():
+            yield kind, "Compute volume ({} workers)".format(workers), timing
+
+def report(results, baseline=None):
+    """Prints the results, with the speedup over a baseline if given"""
+    for kind, name, timing in rows(results):
+        line = "{:<10}{:<32}{:>10.3f} ms/feature".format(
+            kind, name, timing["per_feature_ms"])
+
+        if baseline is not None:
+            for old_kind, old_name, old_timing in rows(baseline):
+                if (old_kind, old_name) == (kind, name):
+                    line += "  {:>6.2f}x".format(old_timing["per_feature_ms"]
+                                                 / timing["per_feature_ms"])
+
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200,
+                        help="the number of buildings of every kind")
+    parser.add_argument("--kinds", nargs="+", default=KINDS, choices=KINDS)
+    parser.add_argument("--stages", nargs="+", default=tuple(STAGES),
+                        choices=tuple(STAGES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resolution", type=int, default=32,
+                        help="the resolution of the free-form shells")
+    parser.add_argument("--tolerance", type=float,
+                        help="the tolerance used to weld the vertices")
+    parser.add_argument("--workers", type=int, nargs="*", default=[1],
+                        help="the numbers of workers to run Compute volume "
+                             "with (none to skip it)")
+    parser.add_argument("--output", help="a JSON file to write the results to")
+    parser.add_argument("--baseline", help="the JSON results of an earlier run")
+    args = parser.parse_args()
+
+    if QgsApplication.instance() is None:
+        app = QgsApplication([], False)
+        app.initQgis()
+
+    results = run(args.count, args.kinds, args.stages, args.repeat, args.seed,
+                  args.resolution, args.tolerance, tuple(args.workers))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    report(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,387 @@
+"""A module that defines caches for geometry metrics"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+CACHE_VERSION = 2
+"""The version of the metric kernels. Persistent caches written with another
+version are discarded, so it has to be bumped whenever a metric changes."""
+
+def geometry_key(wkb, tolerance=None) -> bytes:
+    """Returns the cache key of a geometry, i.e. a digest of its WKB and the
+    tolerance used to mesh it"""
+    digest = hashlib.blake2b(bytes(wkb), digest_size=16)
+    digest.update(repr(tolerance).encode())
+
+    return digest.digest()
+
+def shape_keys(points, offsets, face_offsets, quantum=1e-6) -> list:
+    """Returns a translation-invariant key for every geometry of a batch.
+
+    The points of every geometry are shifted to its minimum corner and
+    quantized to multiples of `quantum`, and then digested together with
+    the face sizes. Copies of a shape at different places (with the same
+    vertex order) get the same key, so translation-invariant metrics need
+    to be computed only once.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        The (N, 3) points of all geometries, in face order
+    offsets : np.ndarray
+        The offset of every face in the points array, plus the total size
+    face_offsets : np.ndarray
+        The index of the first face of every geometry, plus the total
+        number of faces
+    quantum : float, optional
+        The size of the quantization grid, by default 1e-6
+
+    Returns
+    -------
+    list
+        A 16-byte key per geometry
+    """
+    points = np.asarray(points, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    face_offsets = np.asarray(face_offsets, dtype=np.int64)
+
+    point_offsets = offsets[face_offsets]
+    n_geometries = len(face_offsets) - 1
+    point_geometries = np.repeat(np.arange(n_geometries), np.diff(point_offsets))
+
+    corners = np.full((n_geometries, 3), np.inf)
+    np.minimum.at(corners, point_geometries, points)
+    quantized = np.round((points - corners[point_geometries]) / quantum)
+    quantized = quantized.astype(np.int64)
+    sizes = np.diff(offsets)
+
+    point_offsets = point_offsets.tolist()
+    face_offsets = face_offsets.tolist()
+
+    keys = []
+    for i in range(n_geometries):
+        digest = hashlib.blake2b(
+            quantized[point_offsets[i]:point_offsets[i + 1]].tobytes(),
+            digest_size=16)
+        digest.update(sizes[face_offsets[i]:face_offsets[i + 1]].tobytes())
+        keys.append(digest.digest())
+
+    return keys
+
+class MetricsCache:
+    """A bounded, thread-safe LRU cache of geometry metrics.
+
+    Every entry holds the metrics computed so far for one geometry, so
+    different metrics of the same geometry share a single entry.
+    """
+
+    def __init__(self, maxsize=4096) -> None:
+        """Creates an empty cache.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            The maximum number of geometries kept, by default 4096. A size of
+            0 disables caching.
+        """
+        self.__entries = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__maxsize = maxsize
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def get(self, key, name, compute):
+        """Returns the metric `name` of the geometry with the given key.
+
+        Parameters
+        ----------
+        key : bytes
+            The key of the geometry (see `geometry_key`)
+        name : str
+            The name of the metric
+        compute : callable
+            Computes the metric on a miss. It is called without holding the
+            lock, so concurrent misses may compute the same metric twice.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and name in entry:
+                self.__entries.move_to_end(key)
+                self.__hits += 1
+                return entry[name]
+
+            self.__misses += 1
+
+        value = compute()
+        self.put(key, name, value)
+
+        return value
+
+    def put(self, key, name, value) -> None:
+        """Stores the metric `name` of the geometry with the given key"""
+        with self.__lock:
+            if self.__maxsize <= 0:
+                return
+
+            entry = self.__entries.setdefault(key, {})
+            entry[name] = value
+            self.__entries.move_to_end(key)
+
+            self.__evict()
+
+    def resize(self, maxsize) -> None:
+        """Changes the maximum number of geometries kept, evicting the least
+        recently used ones if needed"""
+        with self.__lock:
+            self.__maxsize = maxsize
+            self.__evict()
+
+    def clear(self) -> None:
+        """Removes all entries and resets the counters"""
+        with self.__lock:
+            self.__entries.clear()
+            self.__hits = self.__misses = self.__evictions = 0
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters and the current size"""
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'hit_ratio': self.__hits / lookups if lookups else 0.0,
+                'size': len(self.__entries),
+                'maxsize': self.__maxsize,
+            }
+
+    def __evict(self) -> None:
+        """Drops the least recently used entries above the maximum size. The
+        lock must be held."""
+        while len(self.__entries) > max(self.__maxsize, 0):
+            self.__entries.popitem(last=False)
+            self.__evictions += 1
+
+class DiskCache:
+    """A persistent cache of geometry metrics in an SQLite database.
+
+    Entries are keyed by the geometry key (see `geometry_key`) and the metric
+    name, and survive between sessions, so re-runs over mostly unchanged
+    layers only compute the new geometries. Lookups and inserts work on
+    whole chunks of keys. When the database grows above `max_bytes`, the
+    least recently used entries are evicted.
+    """
+
+    # The maximum number of parameters in one SQLite statement
+    BATCH = 500
+
+    def __init__(self, path, max_bytes=256 * 2**20, version=CACHE_VERSION) -> None:
+        """Opens (or creates) the cache.
+
+        Parameters
+        ----------
+        path : str
+            The path of the SQLite database
+        max_bytes : int, optional
+            The maximum size of the database, by default 256 MB
+        version : int, optional
+            The version of the metrics, by default `CACHE_VERSION`. Entries
+            of other versions are dropped.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.__path = path
+        self.__max_bytes = max_bytes
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        with self.__lock, self.__connection as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS meta "
+                               "(name TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS metrics "
+                               "(key BLOB, name TEXT, value TEXT, accessed REAL, "
+                               "PRIMARY KEY (key, name)) WITHOUT ROWID")
+            connection.execute("CREATE INDEX IF NOT EXISTS metrics_accessed "
+                               "ON metrics (accessed)")
+
+            row = connection.execute(
+                "SELECT value FROM meta WHERE name = 'version'").fetchone()
+            if row is None or row[0] != str(version):
+                connection.execute("DELETE FROM metrics")
+                connection.execute("INSERT OR REPLACE INTO meta VALUES "
+                                   "('version', ?)", (str(version),))
+
+    def path(self) -> str:
+        """Returns the path of the database"""
+        return self.__path
+
+    def get_many(self, keys, name) -> dict:
+        """Returns the cached metric `name` of the given geometries.
+
+        Parameters
+        ----------
+        keys : list
+            The keys of the geometries (see `geometry_key`)
+        name : str
+            The name of the metric
+
+        Returns
+        -------
+        dict
+            The values of the keys that were found
+        """
+        keys = list(keys)
+        found = {}
+
+        with self.__lock, self.__connection as connection:
+            for i in range(0, len(keys), self.BATCH):
+                batch = keys[i:i + self.BATCH]
+                rows = connection.execute(
+                    "SELECT key, value FROM metrics WHERE name = ? AND key IN "
+                    "({})".format(", ".join("?" * len(batch))), [name] + batch)
+                found.update((bytes(key), json.loads(value)) for key, value in rows)
+
+            now = time.time()
+            connection.executemany(
+                "UPDATE metrics SET accessed = ? WHERE key = ? AND name = ?",
+                [(now, key, name) for key in found])
+
+            self.__hits += len(found)
+            self.__misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, items, name) -> None:
+        """Stores the metric `name` of many geometries.
+
+        Parameters
+        ----------
+        items : iterable
+            Pairs of a geometry key and a JSON serializable value
+        name : str
+            The name of the metric
+        """
+        now = time.time()
+        rows = [(key, name, json.dumps(value), now) for key, value in items]
+
+        with self.__lock, self.__connection as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?)", rows)
+
+            self.__evict(connection)
+
+    def fill(self, keys, name, found, values) -> list:
+        """Stores the values computed for the keys missing from `found` and
+        returns the values of all keys.
+
+        Parameters
+        ----------
+        keys : list
+            The keys of a chunk of geometries. Values with a None key (e.g.
+            of empty geometries) are returned but not stored.
+        name : str
+            The name of the metric
+        found : dict
+            The values that were found, as returned by `get_many`
+        values : iterable
+            The values of the missing keys, in the order of `keys`
+
+        Returns
+        -------
+        list
+            The value of every key, in order
+        """
+        values = iter(values)
+        filled = [found[key] if key in found else next(values) for key in keys]
+        self.put_many(((key, value) for key, value in zip(keys, filled)
+                       if key is not None and key not in found), name)
+
+        return filled
+
+    def get(self, key, name, compute):
+        """Returns the metric `name` of a single geometry, computing and
+        storing it on a miss"""
+        found = self.get_many([key], name)
+        if key in found:
+            return found[key]
+
+        value = compute()
+        self.put_many([(key, value)], name)
+
+        return value
+
+    def nbytes(self) -> int:
+        """Returns the number of bytes used by the entries of the database"""
+        with self.__lock:
+            return self.__used_bytes(self.__connection)
+
+    def clear(self) -> None:
+        """Removes all entries, shrinks the database and resets the
+        counters"""
+        with self.__lock:
+            with self.__connection as connection:
+                connection.execute("DELETE FROM metrics")
+            self.__connection.execute("VACUUM")
+            self.__hits = self.__misses = self.__evictions = 0
+
+    def close(self) -> None:
+        """Closes the database"""
+        with self.__lock:
+            self.__connection.close()
+
+    def stats(self) -> dict:
+        """Returns the hit, miss and eviction counters and the current size"""
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            size = self.__connection.execute(
+                "SELECT COUNT(*) FROM metrics").fetchone()[0]
+
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'hit_ratio': self.__hits / lookups if lookups else 0.0,
+                'size': size,
+                'nbytes': self.__used_bytes(self.__connection),
+                'max_bytes': self.__max_bytes,
+            }
+
+    def __used_bytes(self, connection) -> int:
+        """Returns the size of the pages in use. The lock must be held."""
+        pages = connection.execute("PRAGMA page_count").fetchone()[0]
+        free = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+
+        return (pages - free) * page_size
+
+    def __evict(self, connection) -> None:
+        """Drops the least recently used entries until the database uses
+        less than 90% of the maximum size. The lock must be held."""
+        used = self.__used_bytes(connection)
+        if used <= self.__max_bytes:
+            return
+
+        size = connection.execute("SELECT COUNT(*) FROM metrics").fetchone()[0]
+        excess = int(size * (1 - 0.9 * self.__max_bytes / used)) + 1
+
+        connection.execute(
+            "DELETE FROM metrics WHERE (key, name) IN (SELECT key, name FROM "
+            "metrics ORDER BY accessed LIMIT ?)", (excess,))
+        self.__evictions += excess
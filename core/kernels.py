@@ -0,0 +1,369 @@
+"""A module with NumPy kernels that compute metrics over packed faces.
+
+Faces are given as an `offsets` array (the start of every face in
+`connectivity`, plus the total size) and a `connectivity` array with the
+point indices of the faces.
+"""
+
+import numpy as np
+
+def fan_triangles(offsets, connectivity):
+    """Fan-triangulates the faces around their first vertex.
+
+    Returns
+    -------
+    tuple
+        A (T, 3) array with the point indices of the triangles and a (T,)
+        array with the index of the face every triangle comes from
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    connectivity = np.asarray(connectivity)
+
+    counts = np.maximum(np.diff(offsets) - 2, 0)
+    faces = np.repeat(np.arange(len(counts)), counts)
+
+    # The position of every triangle inside its own face, starting at 1
+    first = np.cumsum(counts) - counts
+    local = np.arange(len(faces)) - np.repeat(first, counts) + 1
+
+    starts = offsets[faces]
+    triangles = np.stack([connectivity[starts],
+                          connectivity[starts + local],
+                          connectivity[starts + local + 1]], axis=1)
+
+    return triangles, faces
+
+def face_vector_areas(points, offsets, connectivity, triangles=None) -> np.ndarray:
+    """Returns the vector area of every face.
+
+    The direction is the (unnormalized) face normal and the length is the
+    area of the face. Summing the fan triangles of a face gives the exact
+    vector area for any planar polygon, convex or not. The result of
+    `fan_triangles` can be passed as `triangles` to avoid triangulating
+    again.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    n_faces = len(offsets) - 1
+
+    triangles, faces = triangles or fan_triangles(offsets, connectivity)
+    a, b, c = (points[triangles[:, i]] for i in range(3))
+    cross = np.cross(b - a, c - a) * 0.5
+
+    return np.stack([np.bincount(faces, cross[:, i], minlength=n_faces)
+                     for i in range(3)], axis=1)
+
+def surface_areas(points, offsets, connectivity, groups, n_groups) -> np.ndarray:
+    """Returns the total area of the faces of every group.
+
+    Parameters
+    ----------
+    groups : np.ndarray
+        The group (e.g. feature) index of every face
+    n_groups : int
+        The number of groups
+    """
+    vector_areas = face_vector_areas(points, offsets, connectivity)
+
+    return np.bincount(groups, np.linalg.norm(vector_areas, axis=1),
+                       minlength=n_groups)
+
+def surface_area(points, offsets, connectivity) -> float:
+    """Returns the total area of the faces"""
+    vector_areas = face_vector_areas(points, offsets, connectivity)
+
+    return float(np.linalg.norm(vector_areas, axis=1).sum())
+
+def signed_volumes(points, offsets, connectivity, groups, n_groups,
+                   triangles=None) -> np.ndarray:
+    """Returns the signed volume enclosed by the faces of every group.
+
+    Every group is moved to the centroid of its vertices first, to avoid
+    cancellation with large coordinates. See `signed_volume`.
+
+    Parameters
+    ----------
+    groups : np.ndarray
+        The group (e.g. feature) index of every face
+    n_groups : int
+        The number of groups
+    triangles : tuple, optional
+        The result of `fan_triangles` for the faces, if already computed
+    """
+    points = np.asarray(points, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    connectivity = np.asarray(connectivity)
+
+    # The centroid of every group over its face vertices
+    vertex_groups = np.repeat(groups, np.diff(offsets))
+    counts = np.maximum(np.bincount(vertex_groups, minlength=n_groups), 1)
+    vertices = points[connectivity]
+    centroids = np.stack([np.bincount(vertex_groups, vertices[:, i],
+                                      minlength=n_groups)
+                          for i in range(3)], axis=1) / counts[:, None]
+
+    triangles, faces = triangles or fan_triangles(offsets, connectivity)
+    shift = centroids[groups[faces]]
+    a, b, c = (points[triangles[:, i]] - shift for i in range(3))
+
+    tetrahedra = np.einsum('ij,ij->i', a, np.cross(b, c)) / 6.0
+
+    return np.bincount(groups[faces], tetrahedra, minlength=n_groups)
+
+def signed_volume(points, offsets, connectivity, triangles=None) -> float:
+    """Returns the signed volume enclosed by the faces.
+
+    This follows the divergence theorem: the faces are fan-triangulated and
+    the signed volumes of the tetrahedra between every triangle and the
+    centroid are summed. The result is positive when the faces point
+    outwards and is only meaningful for closed surfaces.
+    """
+    groups = np.zeros(len(offsets) - 1, dtype=np.int64)
+
+    return float(signed_volumes(points, offsets, connectivity, groups, 1,
+                                triangles)[0])
+
+def face_slopes(vector_areas) -> np.ndarray:
+    """Returns the angle (in degrees) between every face normal and the
+    zenith. Degenerate faces get NaN."""
+    return vector_angle(vector_areas, [0, 0, 1])
+
+def face_aspects(vector_areas) -> np.ndarray:
+    """Returns the aspect of every face, i.e. the azimuth (in degrees,
+    clockwise from north) its normal faces. Horizontal and degenerate faces
+    get NaN."""
+    vector_areas = np.asarray(vector_areas, dtype=np.float64)
+    x, y = vector_areas[:, 0], vector_areas[:, 1]
+
+    aspects = np.rad2deg(np.arctan2(x, y)) % 360.0
+    aspects[(x == 0) & (y == 0)] = np.nan
+
+    return aspects
+
+def merge_points(points, groups=None, tolerance=None):
+    """Merges the points that share the same location.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        The (N, 3) points
+    groups : np.ndarray, optional
+        The group of every point. Points of different groups are never
+        merged.
+    tolerance : float, optional
+        If given, points closer than this are welded together (see
+        `weld_points`), otherwise only identical points are merged
+
+    Returns
+    -------
+    tuple
+        The merged points and the index of every input point in them
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    if tolerance:
+        return weld_points(points, groups, tolerance)
+
+    keys = points if groups is None else np.column_stack([groups, points])
+    _, first, inverse = np.unique(keys, axis=0, return_index=True,
+                                  return_inverse=True)
+
+    return points[first], inverse.ravel()
+
+def _lookup(unique, keys) -> np.ndarray:
+    """Returns the position of every key in the sorted `unique` keys, or -1
+    for the keys that are missing (including negative keys)"""
+    if len(unique) == 0:
+        return np.full(np.shape(keys), -1, dtype=np.int64)
+
+    positions = np.searchsorted(unique, keys).clip(max=len(unique) - 1)
+
+    return np.where(unique[positions] == keys, positions, -1)
+
+def _compose(a, b, n_b) -> np.ndarray:
+    """Combines two ranks into one key, or -1 if any of them is missing"""
+    return np.where((a >= 0) & (b >= 0), a * n_b + b, -1)
+
+_DIRECT_PAIRS = 256
+
+def _close_pairs(points, groups, tolerance):
+    """Returns the pairs of points (i, j) with j < i of the same group that
+    are at most `tolerance` apart, sorted by i and then by j.
+
+    The points are bucketed in a grid of cells of size `tolerance`, and the
+    candidates of every point are looked up in its cell and in each of its 26
+    neighbours in turn, so only one shift is held in memory at a time. The
+    cells are identified by ranks along every axis instead of their raw
+    coordinates, combined one axis at a time (with the group folded into the
+    x axis), so the keys do not overflow for large extents.
+    """
+    n_points = len(points)
+    if n_points <= _DIRECT_PAIRS:
+        # Few points, e.g. a single building: comparing all of them is
+        # cheaper than the 27 grid lookups
+        i, j = np.tril_indices(n_points, -1)
+        near = ((groups[i] == groups[j])
+                & (np.linalg.norm(points[i] - points[j], axis=1) <= tolerance))
+
+        return i[near], j[near]
+
+    cells = np.floor(points / tolerance).astype(np.int64)
+    axes = [np.unique(cells[:, axis]) for axis in range(3)]
+
+    # The ranks of the cells of the points and of the cells next to them
+    # along every axis
+    ranks = [[_lookup(axes[axis], cells[:, axis] + shift)
+              for shift in (-1, 0, 1)] for axis in range(3)]
+
+    tables = []
+    keys = groups
+    for axis in range(3):
+        composed = _compose(keys, ranks[axis][1], len(axes[axis]))
+        tables.append(np.unique(composed))
+        keys = _lookup(tables[axis], composed)
+
+    order = np.argsort(keys, kind="stable")
+    sizes = np.bincount(keys, minlength=len(tables[2]))
+    starts = np.cumsum(sizes) - sizes
+
+    pairs_i, pairs_j = [], []
+    for x_rank in ranks[0]:
+        x_keys = _lookup(tables[0], _compose(groups, x_rank, len(axes[0])))
+        for y_rank in ranks[1]:
+            xy_keys = _lookup(tables[1], _compose(x_keys, y_rank, len(axes[1])))
+            for z_rank in ranks[2]:
+                neighbours = _lookup(tables[2],
+                                     _compose(xy_keys, z_rank, len(axes[2])))
+                counts = np.where(neighbours >= 0, sizes[neighbours], 0)
+
+                i = np.repeat(np.arange(n_points), counts)
+                firsts = np.repeat(starts[neighbours] - np.cumsum(counts)
+                                   + counts, counts)
+                j = order[np.arange(counts.sum()) + firsts]
+
+                candidates = j < i
+                i, j = i[candidates], j[candidates]
+                near = np.linalg.norm(points[i] - points[j], axis=1) <= tolerance
+                pairs_i.append(i[near])
+                pairs_j.append(j[near])
+
+    i, j = np.concatenate(pairs_i), np.concatenate(pairs_j)
+    order = np.lexsort((j, i))
+
+    return i[order], j[order]
+
+_WELD_ROUNDS = 4
+
+def weld_points(points, groups, tolerance):
+    """Welds every point to the representative point it is within
+    `tolerance` of, like vtkMergePoints.
+
+    The points are inserted in order: a point that is at most `tolerance`
+    away from a representative point inserted before it is welded to the
+    first such one, otherwise it becomes a representative itself. Welding is
+    not transitive, so no welded point is further than `tolerance` from its
+    representative, however many points lie in between.
+
+    The sequential insertion is resolved in a few vectorized rounds over
+    the pairs of close points: in every round, the points whose earlier
+    neighbours are decided up to their first representative are decided
+    too. Long chains of close points would need one round per link, so the
+    points left after `_WELD_ROUNDS` rounds are decided in one sequential
+    pass over their pairs instead.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        The (N, 3) points
+    groups : np.ndarray or None
+        The group of every point. Points of different groups are never
+        welded.
+    tolerance : float
+        The welding distance
+
+    Returns
+    -------
+    tuple
+        The welded points (the representatives) and the index of every input
+        point in them
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    n_points = len(points)
+    if groups is None:
+        groups = np.zeros(n_points, dtype=np.int64)
+
+    # Identical points are merged first, keeping the order of insertion
+    _, groups = np.unique(np.asarray(groups, dtype=np.int64),
+                          return_inverse=True)
+    keys = np.column_stack([groups.ravel(), points])
+    _, first, inverse = np.unique(keys, axis=0, return_index=True,
+                                  return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty(len(first), dtype=np.int64)
+    rank[order] = np.arange(len(first))
+    inverse = rank[inverse.ravel()]
+
+    first = first[order]
+    unique = points[first]
+    n_unique = len(unique)
+    i, j = _close_pairs(unique, groups.ravel()[first], tolerance)
+
+    target = np.arange(n_unique)
+    is_representative = np.ones(n_unique, dtype=bool)
+    decided = np.zeros(n_unique, dtype=bool)
+
+    for _ in range(_WELD_ROUNDS):
+        # Points that are already welded can never be welded to
+        live = ~decided[i] & (is_representative[j] | ~decided[j])
+        i, j = i[live], j[live]
+
+        # Points without a candidate left are representatives
+        candidates = np.zeros(n_unique, dtype=bool)
+        candidates[i] = True
+        decided |= ~candidates
+
+        if len(i) == 0:
+            break
+
+        # Points whose first candidate is a decided representative are
+        # welded to it
+        firsts = np.flatnonzero(np.r_[True, i[1:] != i[:-1]])
+        welded = decided[j[firsts]]
+        welded_i, welded_j = i[firsts[welded]], j[firsts[welded]]
+        target[welded_i] = welded_j
+        is_representative[welded_i] = False
+        decided[welded_i] = True
+    else:
+        # The pairs are sorted by point, so every candidate of a point is
+        # decided before the point itself
+        representative = is_representative.tolist()
+        done = decided.tolist()
+        for a, b in zip(i.tolist(), j.tolist()):
+            if not done[a] and representative[b]:
+                target[a] = b
+                representative[a] = False
+                done[a] = True
+        is_representative = np.array(representative, dtype=bool)
+
+    representatives = np.flatnonzero(is_representative)
+    index = np.cumsum(is_representative) - 1
+
+    return unique[representatives], index[target][inverse]
+
+def vector_angle(va, vb):
+    """Returns the angle between two vectors (in degrees).
+
+    Either vector can also be an (N, 3) array, in which case an array with
+    the N angles is returned. Zero-length vectors get NaN.
+    """
+    a = np.asarray(va, dtype=np.float64)
+    b = np.asarray(vb, dtype=np.float64)
+
+    inner = np.sum(a * b, axis=-1)
+    norms = np.linalg.norm(a, axis=-1) * np.linalg.norm(b, axis=-1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cos = inner / norms
+    rad = np.arccos(np.clip(cos, -1.0, 1.0))
+    deg = np.rad2deg(rad)
+
+    return deg.item() if deg.ndim == 0 else deg
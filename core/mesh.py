@@ -1,35 +1,52 @@
-"""A module that defines the Mesh class"""
+"""A module that defines the Mesh class.
+
+This is the QGIS side of the meshes: it converts QgsGeometry objects to the
+arrays of `core.surface` and the results back to QgsGeometry objects.
+"""
 
-import pyvista as pv
 import numpy as np
-from qgis.core import QgsGeometry, QgsMultiLineString, QgsLineString
+from qgis.core import QgsGeometry, QgsWkbTypes
+from .kernels import vector_angle
+from .surface import SurfaceMesh, arrays_to_polydata, packed_arrays
+from .wkb import decode_polygons, encode_multilinestring
+
+def geometry_wkb(geometry: QgsGeometry) -> bytes:
+    """Returns the WKB of a QgsGeometry, with any curves segmentized"""
+    if QgsWkbTypes.isCurvedType(geometry.wkbType()):
+        geometry = QgsGeometry(geometry.constGet().segmentize())
 
-def polydata_to_geom(polydata) -> QgsGeometry:
-    """Returns a QgsGeometry from a pyvista mesh"""
-    lines = QgsMultiLineString()
+    return bytes(geometry.asWkb())
 
-    for i in range(polydata.n_cells):
-        lines.addGeometry(QgsLineString(polydata.cell_points(i)))
+def geom_to_arrays(geometry: QgsGeometry):
+    """Converts a QgsGeometry to points and face offsets.
 
-    return lines
+    The geometry is decoded straight from its WKB. Geometries that cannot
+    be decoded this way go through `parts_to_arrays` instead.
+    """
+    try:
+        return decode_polygons(geometry_wkb(geometry))
+    except ValueError:
+        return parts_to_arrays(geometry)
 
-def vector_angle(va, vb):
-    """Returns the angle between two vectors (in degrees)"""
-    a = np.array(va)
-    b = np.array(vb)
+def parts_to_arrays(geometry: QgsGeometry):
+    """Converts a QgsGeometry to points and face offsets by walking its
+    parts"""
+    points = []
+    offsets = [0]
 
-    inner = np.inner(a, b)
-    norms = np.linalg.norm(a) * np.linalg.norm(b)
+    for part in geometry.parts():
+        pts = part.exteriorRing().points()
 
-    cos = inner / norms
-    rad = np.arccos(np.clip(cos, -1.0, 1.0))
-    deg = np.rad2deg(rad)
+        offsets.append(offsets[-1] + len(pts))
+        points.extend([[p.x(), p.y(), p.z()] for p in pts])
 
-    return deg.item()
+    return np.array(points, dtype=float).reshape(-1, 3), np.array(offsets)
 
-class Mesh:
+class Mesh(SurfaceMesh):
     """A class that describes a volumetric object"""
 
+    __slots__ = ("__geometry",)
+
     def __init__(self, geometry: QgsGeometry, tolerance=None) -> None:
         """Generates the mesh object from a given QgsGeometry.
 
@@ -41,70 +58,36 @@ class Mesh:
             The tolerance used to merge vertices together, by default None. If
             None is used, then only exactly similar vertices will be merged.
         """
-        mesh = self.geom_to_polydata(geometry)
-        self.__polydata = mesh
-
-        if not self.isEmpty():
-            self.clean(tolerance)
-
-    def clean(self, tolerance):
-        """Removes duplicate vertices and cleans the dataset"""
-        self.__polydata = self.__polydata.clean(tolerance=tolerance)
-
-    def geom_to_polydata(self, geometry: QgsGeometry) -> pv.PolyData:
-        """Converts a QgsGeometry to PolyData"""
-        points = []
-        faces = []
-
-        for part in geometry.parts():
-            pts = part.exteriorRing().points()
-
-            faces.append(len(pts))
-            faces.extend([len(points) + i for i in range(len(pts))])
+        super().__init__(None, None, tolerance=tolerance)
 
-            points.extend([[p.x(), p.y(), p.z()] for p in pts])
+        self.__geometry = geometry
 
-        if len(points) == 0:
-            return pv.PolyData()
+    def _decode(self):
+        """Converts the geometry to arrays, the first time they are needed.
+        The geometry is not kept afterwards."""
+        geometry, self.__geometry = self.__geometry, None
 
-        mesh = pv.PolyData(points, faces)
-
-        return mesh
-
-    def polydata(self) -> pv.PolyData:
-        """Returns the polydata object"""
-        return self.__polydata
-
-    def area(self) -> float:
-        """Returns the surface area of the mesh"""
-        return float(self.__polydata.area)
-
-    def volume(self) -> float:
-        """Returns the volume of the given geometry"""
-        return float(self.__polydata.volume)
-
-    def slopes(self) -> list:
-        """Returns the slope of individual surface of the geometry"""
-        zenith = [0, 0, 1]
-        normals = self.__polydata.cell_normals
-
-        return [vector_angle(n.tolist(), zenith) for n in normals]
+        return packed_arrays(*geom_to_arrays(geometry))
 
     def isEmpty(self) -> bool:
         """Returns True if the geometry is empty"""
-        return self.__polydata.n_points == 0 or self.__polydata.n_cells == 0
+        if self.__geometry is not None and self.__geometry.isEmpty():
+            return True
 
-    def isSolid(self) -> bool:
-        """Returns True if this mesh is a solid (i.e. a closed volume)"""
-        return self.num_of_holes() == 0
+        return super().isEmpty()
+
+    def geom_to_polydata(self, geometry: QgsGeometry):
+        """Converts a QgsGeometry to PolyData"""
+        return arrays_to_polydata(*geom_to_arrays(geometry))
 
-    def num_of_holes(self) -> int:
-        """Returns the number of open holes in the volume"""
-        return self.__polydata.n_open_edges
+    def getHoles(self) -> QgsGeometry:
+        """Returns the open holes of the mesh as a MultiLineStringZ geometry,
+        with one closed linestring per hole"""
+        loop_offsets, loop_connectivity = self.hole_loops()
+        wkb = encode_multilinestring(self.points(), loop_offsets,
+                                     loop_connectivity)
 
-    def getHoles(self) -> QgsMultiLineString:
-        """Returns the open holes of the mesh as QgsMultiLineString"""
-        edges = self.__polydata.extract_feature_edges(feature_edges=False,
-                                                      manifold_edges=False)
+        geometry = QgsGeometry()
+        geometry.fromWkb(wkb)
 
-        return polydata_to_geom(edges)
+        return geometry
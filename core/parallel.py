@@ -0,0 +1,136 @@
+"""A module that runs the mesh kernels in worker processes.
+
+Nothing in here imports QGIS or VTK, so that the workers start quickly and
+only load NumPy.
+"""
+
+import os
+import shutil
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, spawn
+from multiprocessing.context import SpawnContext, SpawnProcess
+
+from .surface import compute_metrics
+
+def python_executable() -> str:
+    """Returns the Python interpreter to spawn workers with.
+
+    Inside QGIS `sys.executable` is usually the QGIS binary itself, which
+    cannot run a worker, so the interpreter next to the Python installation
+    is looked up instead.
+    """
+    name = os.path.basename(sys.executable).lower()
+    if name.startswith('python'):
+        return sys.executable
+
+    candidates = [
+        os.path.join(sys.exec_prefix, 'python.exe'),
+        os.path.join(sys.exec_prefix, 'bin', 'python3'),
+        os.path.join(sys.exec_prefix, 'bin', 'python'),
+    ]
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+
+    return shutil.which('python3') or shutil.which('python') or sys.executable
+
+# Serializes the swaps of the executable of the multiprocessing module
+_SPAWN_LOCK = threading.Lock()
+
+@contextmanager
+def _worker_executable():
+    """Makes `multiprocessing` spawn `python_executable` for the duration of
+    the block.
+
+    The executable of `multiprocessing` is global to the whole (QGIS)
+    process, so it is only swapped while our processes are started and
+    restored right after, instead of being set for every other user of
+    `multiprocessing` too.
+    """
+    with _SPAWN_LOCK:
+        previous = spawn.get_executable()
+        spawn.set_executable(python_executable())
+        try:
+            yield
+        finally:
+            spawn.set_executable(previous)
+
+class _WorkerProcess(SpawnProcess):
+    """A spawned process that runs `python_executable`"""
+
+    @staticmethod
+    def _Popen(process_obj):
+        with _worker_executable():
+            return SpawnProcess._Popen(process_obj)
+
+class _WorkerContext(SpawnContext):
+    """A spawn context that starts its processes with `python_executable`"""
+
+    Process = _WorkerProcess
+
+def process_pool(workers) -> ProcessPoolExecutor:
+    """Returns a pool of `workers` processes that are spawned (not forked)
+    with a plain Python interpreter"""
+    with _worker_executable():
+        if sys.platform != 'win32':
+            # The resource tracker of the queues and the shared memory blocks
+            # is a process too, started once
+            resource_tracker.ensure_running()
+
+        return ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=_WorkerContext())
+
+def stop_pool(executor) -> None:
+    """Stops a pool without waiting for it: the calls that did not start yet
+    are cancelled (on Python 3.9+) and the workers exit once their current
+    call is done"""
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=False, cancel_futures=True)
+    else:
+        executor.shutdown(wait=False)
+
+def chunk_metrics(wkbs, names, tolerance=None):
+    """Returns the metrics `names` of every WKB geometry in a chunk, as a list
+    of dictionaries (None for empty geometries)"""
+    return [compute_metrics(wkb, tolerance, names) for wkb in wkbs]
+
+def ordered_map(executor, function, items, max_pending):
+    """Runs `function` over the arguments of `items` in `executor`.
+
+    Parameters
+    ----------
+    executor : Executor
+        The executor that runs the function
+    function : callable
+        A picklable function
+    items : iterable
+        Pairs of a chunk and the tuple of arguments to call `function` with
+    max_pending : int
+        The maximum number of calls in flight, which bounds the memory used
+
+    Yields
+    ------
+    tuple
+        Every chunk with its result, in the order of `items`. Calls still
+        pending are cancelled when the generator is closed early.
+    """
+    pending = deque()
+
+    try:
+        for chunk, args in items:
+            pending.append((chunk, executor.submit(function, *args)))
+
+            if len(pending) >= max_pending:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,92 @@
+"""A module that recognizes LoD1 prisms, i.e. extruded footprints.
+
+An LoD1 building has a flat bottom, a flat top at a single height and
+vertical walls in between, so its volume is the area of its top times its
+height. The detector only looks at the geometry of the faces: whether the
+faces close a volume is left to `EdgeIndex`, and the analytic volume is only
+used for shells it reports as closed and consistently oriented, for which it
+is the same as the signed volume of the general kernels.
+"""
+
+import numpy as np
+
+def prism_volumes(points, offsets, connectivity, groups, n_groups,
+                  vector_areas, rtol=1e-6) -> np.ndarray:
+    """Returns the volume of every group of faces that forms a prism.
+
+    The faces of a group form a prism when every vertex is at the lowest or
+    the highest z of the group, and every face is either a horizontal face
+    at one of these heights or a vertical wall. The volume is then the area
+    of the top faces times the height.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        The (N, 3) points
+    offsets : np.ndarray
+        The offset of every face in `connectivity`, plus the total size
+    connectivity : np.ndarray
+        The point indices of the faces
+    groups : np.ndarray
+        The group (e.g. feature) index of every face
+    n_groups : int
+        The number of groups
+    vector_areas : np.ndarray
+        The vector area of every face (see `kernels.face_vector_areas`)
+    rtol : float, optional
+        The tolerance of the checks, relative to the size of the group
+
+    Returns
+    -------
+    np.ndarray
+        The volume of every group, or NaN for the groups that are not
+        prisms. The volume is only meaningful for closed, consistently
+        oriented groups.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    groups = np.asarray(groups, dtype=np.int64)
+    sizes = np.diff(offsets)
+    n_faces = len(sizes)
+
+    vertex_faces = np.repeat(np.arange(n_faces), sizes)
+    vertex_groups = groups[vertex_faces]
+    vertices = points[connectivity]
+
+    lowest = np.full((n_groups, 3), np.inf)
+    highest = np.full((n_groups, 3), -np.inf)
+    np.minimum.at(lowest, vertex_groups, vertices)
+    np.maximum.at(highest, vertex_groups, vertices)
+
+    with np.errstate(invalid="ignore"):
+        extent = np.maximum((highest - lowest).max(axis=1), 1.0)
+        height = highest[:, 2] - lowest[:, 2]
+    atol = rtol * extent
+
+    # Every vertex is at the bottom or at the top of its group
+    z = vertices[:, 2]
+    at_bottom = np.abs(z - lowest[vertex_groups, 2]) <= atol[vertex_groups]
+    at_top = np.abs(z - highest[vertex_groups, 2]) <= atol[vertex_groups]
+
+    # Every face is a flat bottom or top face, or a vertical wall
+    areas = np.linalg.norm(vector_areas, axis=1)
+    horizontal = np.linalg.norm(vector_areas[:, :2], axis=1) <= rtol * areas
+    vertical = np.abs(vector_areas[:, 2]) <= rtol * areas
+    bottom = horizontal & (np.bincount(vertex_faces, at_bottom,
+                                       minlength=n_faces) == sizes)
+    top = horizontal & (np.bincount(vertex_faces, at_top,
+                                    minlength=n_faces) == sizes)
+    valid = (bottom | top | vertical) & (areas > 0)
+
+    prism = ((np.bincount(vertex_groups, ~(at_bottom | at_top),
+                          minlength=n_groups) == 0)
+             & (np.bincount(groups, ~valid, minlength=n_groups) == 0)
+             & (np.bincount(groups, bottom, minlength=n_groups) > 0)
+             & (np.bincount(groups, top, minlength=n_groups) > 0))
+    with np.errstate(invalid="ignore"):
+        prism &= height > atol
+
+    top_areas = np.bincount(groups, np.where(top, vector_areas[:, 2], 0),
+                            minlength=n_groups)
+
+    return np.where(prism, np.abs(top_areas) * np.where(prism, height, 0), np.nan)
@@ -0,0 +1,415 @@
+"""A module with NumPy routines for the topology of packed faces.
+
+Faces are given as an `offsets` array and a `connectivity` array (see
+`core.kernels`). The connectivity should refer to merged points, so that
+neighbouring faces share their vertex indices.
+"""
+
+import numpy as np
+
+def next_vertices(offsets) -> np.ndarray:
+    """Returns the position of the next vertex (cyclically) of every vertex
+    of the faces"""
+    sizes = np.diff(offsets)
+
+    following = np.arange(1, offsets[-1] + 1 if len(offsets) else 1)
+    following[offsets[1:][sizes > 0] - 1] = offsets[:-1][sizes > 0]
+
+    return following
+
+def face_edges(offsets, connectivity):
+    """Returns the directed edges of the faces.
+
+    Every vertex is connected to the next one of its face (cyclically).
+    Degenerate edges, between repeated vertices, are dropped.
+
+    Returns
+    -------
+    tuple
+        The start vertices, the end vertices and the face of every edge
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    connectivity = np.asarray(connectivity, dtype=np.int64)
+    sizes = np.diff(offsets)
+
+    u = connectivity
+    v = connectivity[next_vertices(offsets)]
+    faces = np.repeat(np.arange(len(sizes)), sizes)
+
+    valid = u != v
+
+    return u[valid], v[valid], faces[valid]
+
+def remove_degenerate_faces(offsets, connectivity, return_faces=False):
+    """Removes the repeated consecutive vertices of the faces, which appear
+    after merging points, and the faces left with less than three vertices.
+
+    Parameters
+    ----------
+    offsets : np.ndarray
+        The offset of every face in `connectivity`, plus the total size
+    connectivity : np.ndarray
+        The (merged) point indices of the faces
+    return_faces : bool, optional
+        Also return the index of every remaining face in the input, e.g. to
+        keep track of their groups, by default False
+
+    Returns
+    -------
+    tuple
+        The offsets and the connectivity of the remaining faces (and their
+        indices)
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    connectivity = np.asarray(connectivity, dtype=np.int64)
+    faces = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+    keep = connectivity != connectivity[next_vertices(offsets)]
+    sizes = np.bincount(faces[keep], minlength=len(offsets) - 1)
+    keep &= (sizes >= 3)[faces]
+
+    remaining = np.flatnonzero(sizes >= 3)
+    new_offsets = np.zeros(len(remaining) + 1, dtype=np.int64)
+    np.cumsum(sizes[remaining], out=new_offsets[1:])
+
+    if return_faces:
+        return new_offsets, connectivity[keep], remaining
+
+    return new_offsets, connectivity[keep]
+
+def edge_keys(u, v) -> np.ndarray:
+    """Returns a key for every edge that is the same in both directions"""
+    n_points = int(max(u.max(), v.max())) + 1 if len(u) else 0
+
+    return np.minimum(u, v) * n_points + np.maximum(u, v)
+
+def connected_labels(n_nodes, a, b) -> np.ndarray:
+    """Returns the connected component of every node of a graph.
+
+    The components are found with a vectorized union-find: in every round,
+    the root of each link with the larger label is hooked under the
+    smaller one, and the parents are then fully compressed by pointer
+    jumping until every node points to its root. The links already inside
+    one component are dropped as they go.
+
+    Parameters
+    ----------
+    n_nodes : int
+        The number of nodes
+    a, b : np.ndarray
+        The two nodes of every link
+
+    Returns
+    -------
+    np.ndarray
+        The component of every node, numbered from 0
+    """
+    parents = np.arange(n_nodes)
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+
+    while len(a) > 0:
+        roots_a, roots_b = parents[a], parents[b]
+        linked = roots_a != roots_b
+        a, b = a[linked], b[linked]
+        if len(a) == 0:
+            break
+
+        roots_a, roots_b = roots_a[linked], roots_b[linked]
+        np.minimum.at(parents, np.maximum(roots_a, roots_b),
+                      np.minimum(roots_a, roots_b))
+
+        while True:
+            jumped = parents[parents]
+            if np.array_equal(jumped, parents):
+                break
+            parents = jumped
+
+    _, components = np.unique(parents, return_inverse=True)
+
+    return components.ravel()
+
+class EdgeIndex:
+    """An edge-to-face adjacency index of packed faces.
+
+    The directed edges of the faces (half-edges) are grouped per undirected
+    edge with one `np.unique` over the sorted edge keys, into packed CSR
+    arrays: the half-edges of edge `e` are
+    `half_edges[edge_offsets[e]:edge_offsets[e + 1]]`. All topological
+    queries (open edges, manifoldness, orientation, shells and holes) share
+    the same index.
+    """
+
+    def __init__(self, offsets, connectivity) -> None:
+        """Builds the index.
+
+        Parameters
+        ----------
+        offsets : np.ndarray
+            The offset of every face in `connectivity`, plus the total size
+        connectivity : np.ndarray
+            The (merged) point indices of the faces
+        """
+        self.n_faces = len(offsets) - 1
+        self.u, self.v, self.faces = face_edges(offsets, connectivity)
+
+        # The positions in the connectivity (the corners) of the start and
+        # the end of every half-edge
+        connectivity = np.asarray(connectivity, dtype=np.int64)
+        following = next_vertices(np.asarray(offsets, dtype=np.int64))
+        self.corners = np.flatnonzero(connectivity != connectivity[following])
+        self.next_corners = following[self.corners]
+
+        _, inverse, counts = np.unique(edge_keys(self.u, self.v),
+                                       return_inverse=True, return_counts=True)
+        self.edges = inverse.ravel()
+        self.counts = counts
+        self.half_edges = np.argsort(self.edges, kind='stable')
+        self.edge_offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.edge_offsets[1:])
+
+    def boundary_edges(self):
+        """Returns the boundary edges, i.e. the edges used by exactly one face.
+
+        Returns
+        -------
+        tuple
+            The start vertices, the end vertices and the face of every
+            boundary edge, in the direction of their face
+        """
+        boundary = np.sort(self.half_edges[self.edge_offsets[:-1][self.counts == 1]])
+
+        return self.u[boundary], self.v[boundary], self.faces[boundary]
+
+    def n_open_edges(self) -> int:
+        """Returns the number of edges used by exactly one face"""
+        return int(np.count_nonzero(self.counts == 1))
+
+    def open_edge_counts(self, groups, n_groups) -> np.ndarray:
+        """Returns the number of boundary edges of every group of faces.
+
+        Parameters
+        ----------
+        groups : np.ndarray
+            The group (e.g. feature) index of every face
+        n_groups : int
+            The number of groups
+        """
+        faces = self.faces[self.half_edges[self.edge_offsets[:-1][self.counts == 1]]]
+
+        return np.bincount(np.asarray(groups)[faces], minlength=n_groups)
+
+    def n_non_manifold_edges(self) -> int:
+        """Returns the number of edges used by more than two faces"""
+        return int(np.count_nonzero(self.counts > 2))
+
+    def isManifold(self) -> bool:
+        """Returns True if no edge is used by more than two faces"""
+        return self.n_non_manifold_edges() == 0
+
+    def isOriented(self) -> bool:
+        """Returns True if every pair of faces that share an edge traverse it
+        in opposite directions"""
+        groups = np.zeros(self.n_faces, dtype=np.int64)
+
+        return bool(self.oriented_groups(groups, 1)[0])
+
+    def oriented_groups(self, groups, n_groups) -> np.ndarray:
+        """Returns True for every group of faces in which the pairs of faces
+        that share an edge traverse it in opposite directions.
+
+        Parameters
+        ----------
+        groups : np.ndarray
+            The group (e.g. feature) index of every face
+        n_groups : int
+            The number of groups
+        """
+        starts = self.edge_offsets[:-1][self.counts == 2]
+        first = self.half_edges[starts]
+        second = self.half_edges[starts + 1]
+        flipped = self.u[first] != self.v[second]
+
+        return np.bincount(np.asarray(groups)[self.faces[first[flipped]]],
+                           minlength=n_groups) == 0
+
+    def shells(self) -> np.ndarray:
+        """Returns the shell (connected component of faces that share an
+        edge) of every face, numbered from 0"""
+        # Consecutive half-edges of the same edge link their faces
+        same = self.edges[self.half_edges[1:]] == self.edges[self.half_edges[:-1]]
+        a = self.faces[self.half_edges[:-1][same]]
+        b = self.faces[self.half_edges[1:][same]]
+
+        return connected_labels(self.n_faces, a, b)
+
+    def boundary_links(self):
+        """Pairs the ends of the boundary edges at every vertex, which chains
+        the boundary edges into the loops of the holes.
+
+        At most vertices, two boundary edges meet and are linked. Where
+        holes touch, more boundary edges meet: the faces around the vertex
+        form fans (linked through their shared edges), and the edge coming
+        into the vertex from one fan is linked to the edge leaving it from
+        the next fan, so that every hole keeps its own loop.
+
+        Returns
+        -------
+        tuple
+            The start vertices, the end vertices and the face of every
+            boundary edge (see `boundary_edges`), and the partner of every
+            edge end, or -1. End `e` is the end vertex of boundary edge `e`,
+            end `n + e` its start vertex, for `n` boundary edges.
+        """
+        boundary = np.sort(self.half_edges[self.edge_offsets[:-1][self.counts == 1]])
+        u, v, faces = self.u[boundary], self.v[boundary], self.faces[boundary]
+        n_edges = len(boundary)
+
+        ends = np.concatenate([v, u])
+        outgoing = np.repeat([0, 1], n_edges)
+        corners = np.concatenate([self.next_corners[boundary],
+                                  self.corners[boundary]])
+
+        n_points = int(max(self.u.max(initial=-1), self.v.max(initial=-1))) + 1
+        degrees = np.bincount(ends, minlength=n_points)
+        fans = self.__fans(degrees > 2)[corners]
+
+        order = np.lexsort((outgoing, fans, ends))
+        vertices, starts, sizes = np.unique(ends[order], return_index=True,
+                                            return_counts=True)
+
+        # Rotated by one, the ends around a vertex alternate between the
+        # edge leaving a fan and the edge coming into the next one
+        n_pairs = sizes // 2
+        first = np.repeat(starts, n_pairs)
+        size = np.repeat(sizes, n_pairs)
+        pair = np.arange(n_pairs.sum()) - np.repeat(np.cumsum(n_pairs) - n_pairs,
+                                                    n_pairs)
+        a = order[first + (2 * pair + 1) % size]
+        b = order[first + (2 * pair + 2) % size]
+
+        partners = np.full(2 * n_edges, -1, dtype=np.int64)
+        partners[a] = b
+        partners[b] = a
+
+        return u, v, faces, partners
+
+    def __fans(self, vertices) -> np.ndarray:
+        """Returns the fan of every corner, i.e. the connected group of faces
+        around its vertex that share edges through it. Only the corners of
+        the given vertices are told apart, the others are all 0."""
+        n_corners = int(max(self.corners.max(initial=-1),
+                            self.next_corners.max(initial=-1))) + 1
+        if not vertices.any():
+            return np.zeros(n_corners, dtype=np.int64)
+
+        # Consecutive half-edges of the same edge link the corners of their
+        # faces at both ends of the edge
+        same = self.edges[self.half_edges[1:]] == self.edges[self.half_edges[:-1]]
+        first = self.half_edges[:-1][same]
+        second = self.half_edges[1:][same]
+        forward = self.u[first] == self.u[second]
+
+        a = np.concatenate([self.corners[first], self.next_corners[first]])
+        b = np.concatenate([
+            np.where(forward, self.corners[second], self.next_corners[second]),
+            np.where(forward, self.next_corners[second], self.corners[second])])
+        at = np.concatenate([self.u[first], self.v[first]])
+        around = vertices[at] if len(at) else np.zeros(0, dtype=bool)
+
+        return connected_labels(n_corners, a[around], b[around])
+
+    def hole_counts(self, groups, n_groups) -> np.ndarray:
+        """Returns the number of holes of every group of faces.
+
+        A hole is a loop of boundary edges (see `boundary_links`), so a
+        missing face counts as a single hole no matter how many edges it
+        has, and holes that touch at a vertex still count separately. The
+        loops are the same as those of `boundary_loops`.
+
+        Parameters
+        ----------
+        groups : np.ndarray
+            The group (e.g. feature) index of every face
+        n_groups : int
+            The number of groups
+        """
+        u, _, faces, partners = self.boundary_links()
+        n_edges = len(u)
+
+        linked = np.flatnonzero(partners >= 0)
+        loops = connected_labels(n_edges, linked % n_edges,
+                                 partners[linked] % n_edges)
+        _, first = np.unique(loops, return_index=True)
+
+        return np.bincount(np.asarray(groups)[faces[first]], minlength=n_groups)
+
+    def boundary_loops(self):
+        """Chains the boundary edges into loops, one per hole.
+
+        The loops follow the links of `boundary_links` from edge to edge.
+
+        Returns
+        -------
+        tuple
+            The offset of every loop in the connectivity, plus the total
+            size, and the point indices of the loops. Closed loops end with
+            their first point.
+        """
+        u, v, _, partners = self.boundary_links()
+        n_edges = len(u)
+
+        u, v, partners = u.tolist(), v.tolist(), partners.tolist()
+        used = [False] * n_edges
+        loops = []
+
+        def walk(end, loop):
+            # Follows the links from an edge end, until the loop closes or
+            # the chain stops
+            while partners[end] >= 0 and not used[partners[end] % n_edges]:
+                edge = partners[end] % n_edges
+                used[edge] = True
+                if partners[end] < n_edges:
+                    end = edge + n_edges
+                    loop.append(u[edge])
+                else:
+                    end = edge
+                    loop.append(v[edge])
+
+            return loop, end
+
+        for first in range(n_edges):
+            if used[first]:
+                continue
+
+            used[first] = True
+            loop, end = walk(first, [u[first], v[first]])
+            if partners[end] != first + n_edges:
+                # An open chain, only possible around non-manifold edges:
+                # it may go on behind the first edge too
+                loop = walk(first + n_edges, loop[::-1])[0][::-1]
+
+            loops.append(loop)
+
+        sizes = np.array([len(loop) for loop in loops], dtype=np.int64)
+        loop_offsets = np.zeros(len(loops) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=loop_offsets[1:])
+        loop_connectivity = np.array([i for loop in loops for i in loop],
+                                     dtype=np.int64)
+
+        return loop_offsets, loop_connectivity
+
+def boundary_edges(offsets, connectivity):
+    """Returns the boundary edges of packed faces (see
+    `EdgeIndex.boundary_edges`)"""
+    return EdgeIndex(offsets, connectivity).boundary_edges()
+
+def hole_counts(offsets, connectivity, groups, n_groups) -> np.ndarray:
+    """Returns the number of holes of every group of packed faces (see
+    `EdgeIndex.hole_counts`)"""
+    return EdgeIndex(offsets, connectivity).hole_counts(groups, n_groups)
+
+def boundary_loops(offsets, connectivity):
+    """Returns the boundary loops of packed faces (see
+    `EdgeIndex.boundary_loops`)"""
+    return EdgeIndex(offsets, connectivity).boundary_loops()
@@ -0,0 +1,193 @@
+"""A module that sends packed chunks to worker processes through shared
+memory.
+
+Instead of pickling the WKB of every feature, the main process copies the
+concatenated WKB of a chunk and the offset of every geometry in it into one
+`multiprocessing.shared_memory` block, together with an array for the
+results. Workers only receive the name and the layout of the block, map it,
+decode the geometries straight from it and write their results in place, so
+the main process does no geometry work beyond reading the features.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .parallel import ordered_map
+from .surface import SurfaceBatch
+from .wkb import unpack_polygons
+
+# The alignment of the arrays in a block, in bytes
+ALIGNMENT = 64
+
+class SharedArrays:
+    """Named NumPy arrays stored in one shared memory block.
+
+    The process that creates the block owns it and has to `unlink` it; other
+    processes `attach` to it with its descriptor. Use it as a context
+    manager to close the mapping when done. Views returned by `__getitem__`
+    must not be used after the block is closed.
+    """
+
+    def __init__(self, block, layout, owner=False) -> None:
+        self.__block = block
+        self.__layout = layout
+        self.__owner = owner
+        self.__arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf,
+                             offset=offset)
+            for name, (dtype, shape, offset) in layout.items()
+        }
+
+    @classmethod
+    def create(cls, arrays, empty=None) -> "SharedArrays":
+        """Creates a block with copies of `arrays`.
+
+        Parameters
+        ----------
+        arrays : dict
+            The arrays to copy, by name
+        empty : dict, optional
+            Arrays to allocate without initializing, e.g. for results, as
+            pairs of a dtype and a shape by name
+
+        Returns
+        -------
+        SharedArrays
+            The block, owned by the calling process
+        """
+        specs = {name: (array.dtype, array.shape) for name, array in arrays.items()}
+        specs.update((name, (np.dtype(dtype), tuple(np.atleast_1d(shape))))
+                     for name, (dtype, shape) in (empty or {}).items())
+
+        layout = {}
+        size = 0
+        for name, (dtype, shape) in specs.items():
+            layout[name] = (dtype.str, shape, size)
+            nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+            size += -(-nbytes // ALIGNMENT) * ALIGNMENT
+
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(block, layout, owner=True)
+        for name, array in arrays.items():
+            shared[name][...] = array
+
+        return shared
+
+    @classmethod
+    def attach(cls, descriptor) -> "SharedArrays":
+        """Maps a block created by another process (see `descriptor`)"""
+        name, layout = descriptor
+        try:
+            # Only the owner tracks the block (Python 3.13+)
+            block = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            block = shared_memory.SharedMemory(name=name)
+
+        return cls(block, layout)
+
+    def descriptor(self) -> tuple:
+        """Returns the name and the layout of the block, which is all
+        another process needs to attach to it"""
+        return self.__block.name, self.__layout
+
+    def nbytes(self) -> int:
+        """Returns the size of the block"""
+        return self.__block.size
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self.__arrays[name]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """Drops the views and unmaps the block"""
+        if self.__arrays is None:
+            return
+
+        self.__arrays = None
+        self.__block.close()
+
+    def unlink(self) -> None:
+        """Closes and frees the block. Only its owner may unlink it."""
+        self.close()
+        if self.__owner:
+            self.__owner = False
+            self.__block.unlink()
+
+def share_chunk(wkbs) -> SharedArrays:
+    """Copies the WKB geometries of a chunk into a new shared block, with
+    room for the volume of every geometry"""
+    starts = np.zeros(len(wkbs) + 1, dtype=np.int64)
+    np.cumsum([len(wkb) for wkb in wkbs], out=starts[1:])
+
+    return SharedArrays.create(
+        {"wkb": np.frombuffer(b"".join(wkbs), dtype=np.uint8),
+         "starts": starts},
+        {"volumes": (np.float64, len(wkbs))})
+
+def shared_chunk_volumes(descriptor) -> int:
+    """Decodes a shared chunk (see `share_chunk`) and computes its volumes
+    in place, once per shape. Returns the number of distinct shapes."""
+    with SharedArrays.attach(descriptor) as shared:
+        return _fill_volumes(shared)
+
+def _fill_volumes(shared) -> int:
+    # The decoded arrays are copies, so nothing refers to the block once the
+    # volumes are written
+    batch = SurfaceBatch(*unpack_polygons(shared["wkb"], shared["starts"]))
+    unique, inverse = batch.deduplicate()
+    shared["volumes"][:] = unique.volumes()[inverse]
+
+    return len(unique)
+
+def shared_volumes(executor, items, max_pending):
+    """Computes the volumes of chunks in `executor`, sending them through
+    shared memory.
+
+    Every chunk is deduplicated by shape in its worker (see
+    `SurfaceBatch.deduplicate`), and the WKB reaches the workers without
+    pickling.
+
+    Parameters
+    ----------
+    executor : Executor
+        The executor that runs the workers
+    items : iterable
+        Pairs of a chunk and the tuple with the list of its WKB geometries
+    max_pending : int
+        The maximum number of chunks in flight, which bounds the shared
+        memory used
+
+    Yields
+    ------
+    tuple
+        Every chunk with its volumes and its number of distinct shapes, in
+        the order of `items`. The blocks still in flight are freed when the
+        generator is closed early.
+    """
+    blocks = {}
+
+    def shared_items():
+        for chunk, (wkbs,) in items:
+            shared = share_chunk(wkbs)
+            blocks[id(shared)] = shared
+
+            yield (chunk, shared), (shared.descriptor(),)
+
+    results = ordered_map(executor, shared_chunk_volumes, shared_items(),
+                          max_pending)
+    try:
+        for (chunk, shared), n_shapes in results:
+            volumes = shared["volumes"].copy()
+            blocks.pop(id(shared)).unlink()
+
+            yield chunk, (volumes, n_shapes)
+    finally:
+        results.close()
+        for shared in blocks.values():
+            shared.unlink()
@@ -0,0 +1,331 @@
+"""A module that converts WKB geometries to and from packed NumPy arrays"""
+
+import struct
+
+import numpy as np
+
+POLYGON_TYPES = (3, 17)
+"""WKB base types that are made of rings (Polygon, Triangle)"""
+
+COLLECTION_TYPES = (6, 7, 15, 16)
+"""WKB base types that are made of polygons (MultiPolygon,
+GeometryCollection, PolyhedralSurface, TIN)"""
+
+def _read_header(buffer, offset):
+    """Reads the header of a WKB geometry starting at `offset`.
+
+    Both ISO (e.g. 1006 for MultiPolygonZ) and EWKB (flag bits) type codes
+    are supported.
+
+    Returns
+    -------
+    tuple
+        The byte order, the base geometry type, the number of dimensions, a
+        flag for the presence of z values and the offset of the body
+    """
+    byteorder = '<' if buffer[offset] == 1 else '>'
+    (code,) = struct.unpack_from(byteorder + 'I', buffer, offset + 1)
+    offset += 5
+
+    has_z = bool(code & 0x80000000)
+    has_m = bool(code & 0x40000000)
+    if code & 0x20000000:
+        # Skip the SRID of EWKB geometries
+        offset += 4
+    code &= 0x0FFFFFFF
+
+    base = code % 1000
+    has_z = has_z or code // 1000 in (1, 3)
+    has_m = has_m or code // 1000 in (2, 3)
+
+    return byteorder, base, 2 + has_z + has_m, has_z, offset
+
+def _scan(buffer, offset, rings):
+    """Walks a WKB geometry and appends the location of every exterior ring
+    to `rings`. Returns the offset right after the geometry."""
+    byteorder, base, dims, has_z, offset = _read_header(buffer, offset)
+    if base not in POLYGON_TYPES + COLLECTION_TYPES:
+        raise ValueError(f"Unsupported WKB geometry type: {base}")
+
+    (count,) = struct.unpack_from(byteorder + 'I', buffer, offset)
+    offset += 4
+
+    if base in POLYGON_TYPES:
+        for i in range(count):
+            (n_points,) = struct.unpack_from(byteorder + 'I', buffer, offset)
+            offset += 4
+
+            # Only the exterior ring takes part in the surface
+            if i == 0 and n_points > 0:
+                rings.append((offset, n_points, dims, has_z, byteorder))
+
+            offset += n_points * dims * 8
+    else:
+        for _ in range(count):
+            offset = _scan(buffer, offset, rings)
+
+    return offset
+
+def ranges(starts, lengths) -> np.ndarray:
+    """Returns the concatenation of `arange(s, s + l)` for every start `s` and
+    length `l`, without a Python loop."""
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+
+    ends = np.cumsum(lengths)
+    shifts = np.repeat(starts - ends + lengths, lengths)
+
+    return np.arange(ends[-1] if len(ends) else 0, dtype=np.int64) + shifts
+
+def _ring_coordinates(buffer, rings) -> np.ndarray:
+    """Reads the xyz coordinates of all rings in a single gather"""
+    dims, has_z, byteorder = rings[0][2:]
+
+    if any(r[2:] != (dims, has_z, byteorder) for r in rings):
+        # Mixed layouts are rare, so read them ring by ring
+        return np.concatenate([_ring_coordinates(buffer, [r]) for r in rings])
+
+    offsets = np.fromiter((r[0] for r in rings), dtype=np.int64, count=len(rings))
+    sizes = np.fromiter((r[1] for r in rings), dtype=np.int64, count=len(rings))
+
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    raw = data[ranges(offsets, sizes * dims * 8)]
+    coords = raw.view(byteorder + 'f8').reshape(-1, dims)
+
+    points = np.zeros((len(coords), 3))
+    points[:, :2] = coords[:, :2]
+    if has_z:
+        points[:, 2] = coords[:, 2]
+
+    return points
+
+def _decode(buffer, starts, strict=True):
+    """Decodes the geometries that start at `starts` (plus the end of the
+    buffer) in a concatenated WKB buffer. Unless `strict` is set, geometries
+    that cannot be decoded are left empty.
+
+    Returns
+    -------
+    tuple
+        The points, the face offsets and the number of faces per geometry
+    """
+    rings = []
+    counts = np.zeros(len(starts) - 1, dtype=np.int64)
+
+    for i in range(len(counts)):
+        if starts[i + 1] > starts[i]:
+            before = len(rings)
+            try:
+                _scan(buffer, starts[i], rings)
+            except (ValueError, struct.error):
+                if strict:
+                    raise
+                del rings[before:]
+            counts[i] = len(rings) - before
+
+    if len(rings) == 0:
+        return np.empty((0, 3)), np.zeros(1, dtype=np.int64), counts
+
+    points = _ring_coordinates(buffer, rings)
+
+    sizes = np.fromiter((r[1] for r in rings), dtype=np.int64, count=len(rings))
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+
+    # Drop the repeated closing point of every closed ring
+    closed = (sizes > 1) & np.all(points[starts] == points[ends - 1], axis=1)
+    keep = np.ones(len(points), dtype=bool)
+    keep[ends[closed] - 1] = False
+
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum(sizes - closed, out=offsets[1:])
+
+    return points[keep], offsets, counts
+
+def decode_polygons(wkb):
+    """Decodes the exterior rings of a polygonal WKB geometry to arrays.
+
+    The closing point of every ring is dropped and geometries without z
+    values get a z of 0.
+
+    Parameters
+    ----------
+    wkb : bytes
+        The WKB of a (Multi)Polygon, PolyhedralSurface, TIN or collection
+        of those
+
+    Returns
+    -------
+    tuple
+        A (N, 3) array with the points and a (M + 1,) array with the offset
+        of each of the M faces in the points array
+
+    Raises
+    ------
+    ValueError
+        If the geometry contains non-polygonal parts
+    """
+    if not isinstance(wkb, (bytes, bytearray, memoryview)):
+        wkb = bytes(wkb)
+
+    points, offsets, _ = _decode(wkb, [0, len(wkb)])
+
+    return points, offsets
+
+def pack_polygons(wkbs):
+    """Decodes many polygonal WKB geometries into one set of arrays.
+
+    All coordinates are read with a single gather over the concatenated
+    buffers. Geometries that cannot be decoded are packed as empty.
+
+    Parameters
+    ----------
+    wkbs : list
+        The WKB of every geometry
+
+    Returns
+    -------
+    tuple
+        The (N, 3) points, the (M + 1,) face offsets and a (K + 1,) array
+        with the index of the first face of each of the K geometries
+    """
+    wkbs = [w if isinstance(w, bytes) else bytes(w) for w in wkbs]
+
+    starts = np.zeros(len(wkbs) + 1, dtype=np.int64)
+    np.cumsum([len(w) for w in wkbs], out=starts[1:])
+
+    return unpack_polygons(b''.join(wkbs), starts)
+
+def unpack_polygons(buffer, starts):
+    """Decodes polygonal WKB geometries that are already concatenated, e.g.
+    in shared memory. See `pack_polygons`.
+
+    Parameters
+    ----------
+    buffer : bytes or np.ndarray
+        The concatenated WKB, as any object with the buffer protocol
+    starts : np.ndarray
+        The offset of every geometry in the buffer, plus the total size
+
+    Returns
+    -------
+    tuple
+        The (N, 3) points, the (M + 1,) face offsets and a (K + 1,) array
+        with the index of the first face of each of the K geometries. They
+        do not share memory with the buffer.
+    """
+    points, offsets, counts = _decode(buffer, starts, strict=False)
+
+    face_offsets = np.zeros(len(starts), dtype=np.int64)
+    np.cumsum(counts, out=face_offsets[1:])
+
+    return points, offsets, face_offsets
+
+def vtk_faces(offsets, connectivity=None) -> np.ndarray:
+    """Returns the faces in the packed VTK layout (`[n, i0, ..., n, ...]`).
+
+    Parameters
+    ----------
+    offsets : np.ndarray
+        The offset of every face in `connectivity`, plus the total size
+    connectivity : np.ndarray, optional
+        The point indices of the faces, by default the points in order
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if connectivity is None:
+        connectivity = np.arange(offsets[-1], dtype=np.int64)
+
+    sizes = np.diff(offsets)
+    faces = np.empty(len(connectivity) + len(sizes), dtype=np.int64)
+
+    heads = offsets[:-1] + np.arange(len(sizes))
+    body = np.ones(len(faces), dtype=bool)
+    body[heads] = False
+
+    faces[heads] = sizes
+    faces[body] = connectivity
+
+    return faces
+
+def encode_multilinestring(points, offsets, connectivity=None) -> bytes:
+    """Encodes lines as the (little endian) WKB of a MultiLineStringZ.
+
+    The headers and coordinate blocks of all lines are written into one
+    buffer with vectorized scatters, without a Python loop over the lines.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        The (N, 3) points
+    offsets : np.ndarray
+        The offset of every line in `connectivity`, plus the total size
+    connectivity : np.ndarray, optional
+        The point indices of the lines, by default the points in order
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if connectivity is None:
+        connectivity = np.arange(offsets[-1], dtype=np.int64)
+
+    sizes = np.diff(offsets)
+    coords = np.ascontiguousarray(points[connectivity], dtype='<f8')
+
+    headers = np.zeros(len(sizes), dtype=[('order', 'u1'), ('type', '<u4'),
+                                          ('count', '<u4')])
+    headers['order'] = 1
+    headers['type'] = 1002
+    headers['count'] = sizes
+
+    # Every line is a 9-byte header followed by its coordinates
+    lengths = headers.itemsize + sizes * 24
+    starts = np.cumsum(lengths) - lengths
+
+    body = np.empty(int(lengths.sum()), dtype=np.uint8)
+    body[ranges(starts, np.full(len(sizes), headers.itemsize))] = \
+        headers.view(np.uint8)
+    body[ranges(starts + headers.itemsize, sizes * 24)] = \
+        coords.view(np.uint8).ravel()
+
+    return struct.pack('<BII', 1, 1005, len(sizes)) + body.tobytes()
+
+def encode_multipolygon(points, offsets, connectivity=None) -> bytes:
+    """Encodes faces as the (little endian) WKB of a MultiPolygonZ, with one
+    ring per polygon. The rings are closed by repeating their first point.
+
+    Parameters
+    ----------
+    points : np.ndarray
+        The (N, 3) points
+    offsets : np.ndarray
+        The offset of every face in `connectivity`, plus the total size
+    connectivity : np.ndarray, optional
+        The point indices of the faces, by default the points in order
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if connectivity is None:
+        connectivity = np.arange(offsets[-1], dtype=np.int64)
+    connectivity = np.asarray(connectivity, dtype=np.int64)
+
+    sizes = np.diff(offsets)
+    closed = np.insert(connectivity, offsets[1:], connectivity[offsets[:-1]])
+    coords = np.ascontiguousarray(
+        np.asarray(points, dtype=np.float64).reshape(-1, 3)[closed], dtype='<f8')
+
+    headers = np.zeros(len(sizes), dtype=[('order', 'u1'), ('type', '<u4'),
+                                          ('rings', '<u4'), ('count', '<u4')])
+    headers['order'] = 1
+    headers['type'] = 1003
+    headers['rings'] = 1
+    headers['count'] = sizes + 1
+
+    # Every polygon is a 13-byte header followed by its coordinates
+    lengths = headers.itemsize + (sizes + 1) * 24
+    starts = np.cumsum(lengths) - lengths
+
+    body = np.empty(int(lengths.sum()), dtype=np.uint8)
+    body[ranges(starts, np.full(len(sizes), headers.itemsize))] = \
+        headers.view(np.uint8)
+    body[ranges(starts + headers.itemsize, (sizes + 1) * 24)] = \
+        coords.view(np.uint8).ravel()
+
+    return struct.pack('<BII', 1, 1006, len(sizes)) + body.tobytes()
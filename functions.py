@@ -1,5 +1,14 @@
 from qgis.utils import qgsfunction
-from .core.mesh import Mesh
+from .core.cache import MetricsCache, geometry_key
+from .core.mesh import Mesh, geometry_wkb
+from .settings import disk_cache, memory_cache_size, use_disk_cache
+
+metrics_cache = MetricsCache(memory_cache_size())
+"""The metrics computed by the expression functions, keyed by geometry. The
+size comes from the `three_toolbox/cache_size` setting and can be changed
+with `metrics_cache.resize()`; `metrics_cache.stats()` reports the hit and
+miss counters. With the `three_toolbox/disk_cache` setting, misses are
+looked up in the persistent cache before meshing the geometry."""
 
 functions_help = {
     "volume": """
@@ -111,9 +120,72 @@ functions_help = {
             </li>
         </ul>
         </div>
+    """,
+    "metrics_3d": """
+        Returns a map with all the 3D metrics of a multipolygon geometry, which
+        is meshed only once. The map contains the keys <i>volume</i>,
+        <i>area</i>, <i>is_solid</i>, <i>holes</i>, <i>z_min</i>, <i>z_max</i>,
+        <i>slope</i>, <i>slope_min</i>, <i>slope_max</i> and <i>slope_mean</i>.
+
+        <h4>Syntax</h4>
+        <div class="syntax">
+            <code>
+                <span class="functionname">metrics_3d</span>
+                (<span class="argument">geometry</span>)
+            </code>
+        </div>
+
+        <h4>Arguments</h4>
+        <div class="arguments">
+            <table>
+                <tr><td class="argument">geometry</td><td>multipolygon geometry object</td></tr>
+            </table>
+        </div>
+
+        <h4>Examples</h4>
+        <div class="examples">
+        <ul>
+            <li>
+                <code>map_get(metrics_3d($geometry), 'volume')</code> &rarr; <code>The volume of the current geometry</code>
+            </li>
+        </ul>
+        </div>
     """
 }
 
+def cached_metric(geometry, name, compute, empty=None):
+    """Returns a metric of a geometry from `metrics_cache` (or the persistent
+    cache), meshing the geometry only on a miss.
+
+    Parameters
+    ----------
+    geometry : QgsGeometry
+        A multipolygon geometry
+    name : str
+        The name of the metric in the cache
+    compute : callable
+        Computes the metric from a non-empty `Mesh`
+    empty : any, optional
+        The value of the metric for empty geometries, by default None
+    """
+    def mesh_metric():
+        mesh = Mesh(geometry)
+
+        if mesh.isEmpty():
+            return empty
+
+        return compute(mesh)
+
+    def evaluate():
+        if use_disk_cache():
+            return disk_cache().get(key, name, mesh_metric)
+
+        return mesh_metric()
+
+    key = geometry_key(geometry_wkb(geometry))
+
+    return metrics_cache.get(key, name, evaluate)
+
 @qgsfunction('auto', "3D Geometry", register=False, helpText=functions_help["volume"])
 def volume(geometry, feature, parent):
     """Returns the volume of a multipolygon geometry. If the geometry is
@@ -134,12 +206,7 @@ def volume(geometry, feature, parent):
         The volume bounded by the current geometry
     """
 
-    mesh = Mesh(geometry)
-
-    if mesh.isEmpty():
-        return 0
-
-    return mesh.volume()
+    return cached_metric(geometry, "volume", Mesh.volume, 0)
 
 @qgsfunction('auto', "3D Geometry", register=False, helpText=functions_help["is_solid"])
 def is_solid(geometry, feature, parent):
@@ -160,12 +227,7 @@ def is_solid(geometry, feature, parent):
         Return `True` if there are no holes on the geometry.
     """
 
-    mesh = Mesh(geometry)
-
-    if mesh.isEmpty():
-        return False
-
-    return mesh.isSolid()
+    return cached_metric(geometry, "is_solid", Mesh.isSolid, False)
 
 @qgsfunction('auto', "3D Geometry", register=False, helpText=functions_help["surface_area"])
 def surface_area(geometry, feature, parent) -> float:
@@ -186,12 +248,7 @@ def surface_area(geometry, feature, parent) -> float:
         The surface area of the geometry
     """
 
-    mesh = Mesh(geometry)
-
-    if mesh.isEmpty():
-        return 0
-
-    return mesh.area()
+    return cached_metric(geometry, "area", Mesh.area, 0)
 
 @qgsfunction('auto', "3D Geometry", register=False, helpText=functions_help["slope"])
 def slope(geometry, feature, parent) -> float:
@@ -212,9 +269,35 @@ def slope(geometry, feature, parent) -> float:
         The surface area of the geometry
     """
 
-    mesh = Mesh(geometry)
+    return cached_metric(geometry, "slope", lambda mesh: float(mesh.slopes()[0]))
+
+@qgsfunction('auto', "3D Geometry", register=False, helpText=functions_help["metrics_3d"])
+def metrics_3d(geometry, feature, parent) -> dict:
+    """Returns all the 3D metrics of a multipolygon geometry as a map, so that
+    the geometry is meshed only once.
+
+    Parameters
+    ----------
+    geometry : QgsGeometry
+        A multipolygon geometry
+    feature : QgsFeature
+        The current feature (unused)
+    parent : any
+        The parent feature (unused)
+
+    Returns
+    -------
+    dict
+        The volume, area, solidity, number of holes, z range and slope
+        statistics of the geometry
+    """
+
+    metrics = cached_metric(geometry, "metrics_3d", Mesh.metrics)
 
-    if mesh.isEmpty():
-        return None
+    if metrics is not None:
+        # Let the single-metric functions reuse this evaluation
+        key = geometry_key(geometry_wkb(geometry))
+        for name in ("volume", "area", "is_solid", "slope"):
+            metrics_cache.put(key, name, metrics[name])
 
-    return mesh.slopes()[0]
+    return metrics
@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ 3DToolbox
+                                 A QGIS plugin
+ This plugin provides tools and functions for 3D geometries and volumes
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2021-08-11
+        copyright            : (C) 2021 by 3D geoinformation group
+        email                : steliosvitalis@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = '3D geoinformation group'
+__date__ = '2021-08-11'
+__copyright__ = '(C) 2021 by 3D geoinformation group'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from PyQt5.QtCore import QVariant
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.core import (QgsProcessing,
+                       QgsFeatureRequest,
+                       QgsFeature,
+                       QgsField,
+                       QgsProcessingAlgorithm,
+                       QgsProcessingException,
+                       QgsProcessingParameterBoolean,
+                       QgsProcessingParameterFeatureSource,
+                       QgsProcessingParameterFeatureSink)
+from ...core.parallel import (chunk_metrics, ordered_map, process_pool,
+                              stop_pool)
+from ..chunked import ChunkedAlgorithm
+from ..profiling import StageProfiler
+from ..sinks import BufferedSink, ThrottledProgress
+
+
+class ComputeMetricsAlgorithm(ChunkedAlgorithm, QgsProcessingAlgorithm):
+    """
+    Computes the selected 3D metrics of every feature in a single pass over
+    the input layer. Every geometry is meshed once, and only the stages of
+    the mesh that the selected metrics need are computed.
+    """
+
+    # Constants used to refer to parameters and outputs. They will be
+    # used when calling the algorithm from another algorithm, or when
+    # calling from the QGIS console.
+
+    OUTPUT = 'OUTPUT'
+    INPUT = 'INPUT'
+
+    # The checkboxes of the metrics, with the fields every one adds
+    METRICS = [
+        ('VOLUME', 'Volume', [('volume', QVariant.Double)]),
+        ('AREA', 'Surface area', [('area', QVariant.Double)]),
+        ('SOLID', 'Solidity', [('is_solid', QVariant.Bool)]),
+        ('HOLES', 'Number of holes', [('holes', QVariant.Int)]),
+        ('Z_RANGE', 'Minimum and maximum z', [('z_min', QVariant.Double),
+                                              ('z_max', QVariant.Double)]),
+        ('SLOPES', 'Slope statistics', [('slope_min', QVariant.Double),
+                                        ('slope_max', QVariant.Double),
+                                        ('slope_mean', QVariant.Double)]),
+    ]
+
+    def initAlgorithm(self, config):
+        """
+        Here we define the inputs and output of the algorithm, along
+        with some other properties.
+        """
+
+        # We add the input vector features source. It can have any kind of
+        # geometry.
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT,
+                self.tr('Input layer'),
+                [QgsProcessing.TypeVectorAnyGeometry]
+            )
+        )
+
+        # One checkbox per group of metrics
+        for parameter, description, _ in self.METRICS:
+            self.addParameter(
+                QgsProcessingParameterBoolean(
+                    parameter,
+                    self.tr(description),
+                    True
+                )
+            )
+
+        # We add a feature sink in which to store our processed features (this
+        # usually takes the form of a newly created vector layer when the
+        # algorithm is run in QGIS).
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                self.OUTPUT,
+                self.tr('Added metrics')
+            )
+        )
+
+        self.addWorkersParameter()
+        self.addToleranceParameter()
+        self.addCacheParameter()
+        self.addBatchSizeParameter()
+
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Here is where the processing itself takes place.
+        """
+
+        # Disable geometry checking, since these are 3D geometries and QGIS
+        # can count them as invalid.
+        context.setInvalidGeometryCheck(QgsFeatureRequest.GeometryNoCheck)
+
+        # The fields of the selected metrics
+        metric_fields = [field
+                         for parameter, _, fields in self.METRICS
+                         if self.parameterAsBoolean(parameters, parameter, context)
+                         for field in fields]
+        if len(metric_fields) == 0:
+            raise QgsProcessingException(self.tr('No metric is selected'))
+        names = [name for name, _ in metric_fields]
+
+        # Retrieve the feature source and sink. The 'dest_id' variable is used
+        # to uniquely identify the feature sink, and must be included in the
+        # dictionary returned by the processAlgorithm function.
+        source = self.parameterAsSource(parameters, self.INPUT, context)
+
+        fields = source.fields()
+        for name, field_type in metric_fields:
+            fields.append(QgsField(name, field_type))
+        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT,
+                context, fields, source.wkbType(), source.sourceCrs())
+
+        # Compute the number of steps to display within the progress bar and
+        # get features from source
+        total = 100.0 / source.featureCount() if source.featureCount() else 0
+        request = QgsFeatureRequest()
+        request = request.setInvalidGeometryCheck(0)
+        features = source.getFeatures(request)
+
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+        tolerance = self.parameterAsTolerance(parameters, context)
+        cache = self.parameterAsCache(parameters, context)
+
+        # The stages are not profiled here
+        profiler = StageProfiler(False)
+        chunks = self.chunks(features, feedback, profiler)
+        calls = self.calls(chunks, names, tolerance, cache, profiler)
+
+        if workers > 1:
+            # Workers get the WKB of the geometries and return the metrics in
+            # the same order
+            executor = process_pool(workers)
+            results = ordered_map(executor, chunk_metrics, calls, 2 * workers)
+        else:
+            executor = None
+            results = ((chunk, chunk_metrics(*args)) for chunk, args in calls)
+
+        batch_size = self.parameterAsInt(parameters, self.BATCH_SIZE, context)
+        progress = ThrottledProgress(feedback)
+
+        current = 0
+        try:
+            # The features computed so far are written out on cancel too
+            with BufferedSink(sink, batch_size) as output:
+                for (chunk, keys, found), computed in results:
+                    # Leaving the loop cancels the chunks still pending
+                    if feedback.isCanceled():
+                        break
+
+                    metrics = computed
+                    if cache is not None:
+                        metrics = self.fill(cache, names, keys, found, computed)
+
+                    # Empty geometries get NULL metrics
+                    for feature, values in zip(chunk, metrics):
+                        # Stop the algorithm if cancel button has been clicked
+                        if feedback.isCanceled():
+                            break
+
+                        new_feature = QgsFeature()
+                        new_feature.setFields(fields)
+
+                        attributes = feature.attributes()
+                        attributes.extend(values[name] if values else None
+                                          for name in names)
+
+                        new_feature.setAttributes(attributes)
+                        new_feature.setGeometry(feature.geometry())
+
+                        # Add a feature in the sink
+                        output.addFeature(new_feature)
+
+                        current += 1
+
+                        # Update the progress bar
+                        progress.setProgress(int(current * total))
+        finally:
+            results.close()
+            if executor is not None:
+                stop_pool(executor)
+
+        progress.setProgress(int(current * total), force=True)
+
+        # Return the results of the algorithm. In this case our only result is
+        # the feature sink which contains the processed features, but some
+        # algorithms may return multiple feature sinks, calculated numeric
+        # statistics, etc. These should all be included in the returned
+        # dictionary, with keys matching the feature corresponding parameter
+        # or output names.
+        return {self.OUTPUT: dest_id}
+
+    def calls(self, chunks, names, tolerance, cache, profiler):
+        """Yields every chunk, with its cache keys and the metrics found in
+        the cache, and the arguments of `chunk_metrics` for the geometries
+        that miss any of the metrics"""
+        for chunk, _, keys, found, missing in self.cachedChunks(
+                chunks, cache, names, tolerance, profiler):
+            yield (chunk, keys, found), (missing, names, tolerance)
+
+    def fill(self, cache, names, keys, found, computed):
+        """Stores the computed metrics in the cache and returns the metrics
+        of the whole chunk"""
+        complete = [all(key in found[name] for name in names) for key in keys]
+        missing = [key for key, done in zip(keys, complete) if not done]
+        stored = [(key, values) for key, values in zip(missing, computed)
+                  if key is not None and values is not None]
+
+        for name in names:
+            cache.put_many(((key, values[name]) for key, values in stored), name)
+
+        computed = iter(computed)
+
+        return [{name: found[name][key] for name in names} if done
+                else next(computed)
+                for key, done in zip(keys, complete)]
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm. This
+        string should be fixed for the algorithm, and must not be localised.
+        The name should be unique within each provider. Names should contain
+        lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return 'Compute 3D metrics'
+
+    def displayName(self):
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return self.tr(self.name())
+
+    def group(self):
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return self.tr(self.groupId())
+
+    def groupId(self):
+        """
+        Returns the unique ID of the group this algorithm belongs to. This
+        string should be fixed for the algorithm, and must not be localised.
+        The group id should be unique within each provider. Group id should
+        contain lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return 'Analysis'
+
+    def shortHelpString(self):
+        """Returns help string for the algorithm's UI"""
+        return """This algorithm computes the selected 3D metrics of
+        multipolygon objects (volume, surface area, solidity, number of
+        holes, z range and slope statistics) in a single pass, meshing every
+        feature once. Empty geometries get NULL metrics.
+
+        With more than one worker process, the features are meshed in
+        parallel and written back in their original order.
+        """
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def createInstance(self):
+        return ComputeMetricsAlgorithm()
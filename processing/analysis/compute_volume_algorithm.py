@@ -30,21 +30,32 @@ __copyright__ = '(C) 2021 by 3D geoinformation group'
 
 __revision__ = '$Format:%H$'
 
+from contextlib import nullcontext
+
 from re import M
 from PyQt5.QtCore import QVariant
 from qgis.PyQt.QtCore import QCoreApplication
 from qgis.core import (QgsProcessing,
                        QgsFeatureRequest,
-                       QgsFeatureSink,
                        QgsFeature,
                        QgsField,
+                       QgsFields,
                        QgsProcessingAlgorithm,
+                       QgsProcessingException,
+                       QgsProcessingParameterEnum,
                        QgsProcessingParameterFeatureSource,
-                       QgsProcessingParameterFeatureSink)
-from ...core.mesh import Mesh
-
-
-class ComputeVolumeAlgorithm(QgsProcessingAlgorithm):
+                       QgsProcessingParameterFeatureSink,
+                       QgsProcessingUtils,
+                       QgsVectorDataProvider,
+                       QgsWkbTypes)
+from ...core.parallel import process_pool, stop_pool
+from ...core.surface import SurfaceBatch
+from ...core.transport import shared_volumes
+from ..chunked import ChunkedAlgorithm
+from ..sinks import BufferedAttributeChanges, BufferedSink, ThrottledProgress
+
+
+class ComputeVolumeAlgorithm(ChunkedAlgorithm, QgsProcessingAlgorithm):
     """
     This is an example algorithm that takes a vector layer and
     creates a new identical one.
@@ -64,6 +75,22 @@ class ComputeVolumeAlgorithm(QgsProcessingAlgorithm):
 
     OUTPUT = 'OUTPUT'
     INPUT = 'INPUT'
+    MODE = 'MODE'
+
+    # The output modes: a copy of the input with the volume, a table of the
+    # feature ids and the volumes, or the input layer updated in place
+    MODE_LAYER = 0
+    MODE_TABLE = 1
+    MODE_UPDATE = 2
+
+    def __init__(self):
+        super().__init__()
+
+        # The layer to update in place and its new volumes, which are only
+        # written in postProcessAlgorithm, on the main thread
+        self.__update_layer_id = None
+        self.__updates = {}
+        self.__batch_size = 1000
 
     def initAlgorithm(self, config):
         """
@@ -81,16 +108,39 @@ class ComputeVolumeAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        # The table and the update modes do not copy the geometries, which
+        # are usually much bigger than the volumes.
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.MODE,
+                self.tr('Output'),
+                [self.tr('New layer with the geometries'),
+                 self.tr('Table without geometries'),
+                 self.tr('Update the volume field of the input layer')],
+                False,
+                self.MODE_LAYER
+            )
+        )
+
         # We add a feature sink in which to store our processed features (this
         # usually takes the form of a newly created vector layer when the
-        # algorithm is run in QGIS).
+        # algorithm is run in QGIS). It is not used when the input layer is
+        # updated.
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 self.OUTPUT,
-                self.tr('Added volume')
+                self.tr('Added volume'),
+                QgsProcessing.TypeVectorAnyGeometry,
+                None,
+                True
             )
         )
 
+        self.addWorkersParameter()
+        self.addCacheParameter()
+        self.addBatchSizeParameter()
+        self.addProfileParameters()
+
     def processAlgorithm(self, parameters, context, feedback):
         """
         Here is where the processing itself takes place.
@@ -110,13 +160,39 @@ class ComputeVolumeAlgorithm(QgsProcessingAlgorithm):
         # to uniquely identify the feature sink, and must be included in the
         # dictionary returned by the processAlgorithm function.
         source = self.parameterAsSource(parameters, self.INPUT, context)
+        mode = self.parameterAsEnum(parameters, self.MODE, context)
 
         volume_field = QgsField('volume', QVariant.Double)
+        batch_size = self.parameterAsInt(parameters, self.BATCH_SIZE, context)
+
+        if mode == self.MODE_UPDATE:
+            # The layer must not be changed while its features are read, and
+            # not off the main thread, so the volumes are only collected here
+            layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+            if layer is None:
+                raise QgsProcessingException(
+                    self.tr('Only layers can be updated in place'))
+            self.__update_layer_id = layer.id()
+            self.__updates = {}
+            self.__batch_size = batch_size
+            output = nullcontext()
+            dest_id = layer.id()
+        else:
+            if mode == self.MODE_TABLE:
+                fields = QgsFields()
+                fields.append(QgsField('feature_id', QVariant.LongLong))
+                wkb_type = QgsWkbTypes.NoGeometry
+            else:
+                fields = source.fields()
+                wkb_type = source.wkbType()
+            fields.append(volume_field)
 
-        fields = source.fields()
-        fields.append(volume_field)
-        (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT,
-                context, fields, source.wkbType(), source.sourceCrs())
+            (sink, dest_id) = self.parameterAsSink(parameters, self.OUTPUT,
+                    context, fields, wkb_type, source.sourceCrs())
+            if sink is None:
+                raise QgsProcessingException(
+                    self.invalidSinkError(parameters, self.OUTPUT))
+            output = BufferedSink(sink, batch_size)
 
         # Compute the number of steps to display within the progress bar and
         # get features from source
@@ -125,32 +201,100 @@ class ComputeVolumeAlgorithm(QgsProcessingAlgorithm):
         request = request.setInvalidGeometryCheck(0)
         features = source.getFeatures(request)
 
-        for current, feature in enumerate(features):
-            # Stop the algorithm if cancel button has been clicked
-            if feedback.isCanceled():
-                break
+        profiler, profile_file = self.parameterAsProfiler(parameters, context)
 
-            mesh = Mesh(feature.geometry())
+        workers = self.parameterAsInt(parameters, self.WORKERS, context)
+        chunks = self.chunks(features, feedback, profiler)
+        cache = self.parameterAsCache(parameters, context)
 
-            if mesh.isEmpty():
-                volume = 0
-            else:
-                volume = mesh.volume()
+        # Copies of the same shape are meshed once per chunk
+        calls = self.calls(chunks, cache, profiler)
 
-            new_feature = QgsFeature()
-            new_feature.setFields(fields)
+        if workers > 1:
+            # Workers get the decoded chunks through shared memory and write
+            # the volumes back in place, in the same order
+            executor = process_pool(workers)
+            results = shared_volumes(executor, calls, 2 * workers)
+            steps = profiler.iterate('wait for workers', results)
+        else:
+            executor = None
+            results = ((chunk, self.shapeVolumes(*args, profiler))
+                       for chunk, args in calls)
+            steps = results
 
-            attributes = feature.attributes()
-            attributes.append(volume)
+        progress = ThrottledProgress(feedback)
 
-            new_feature.setAttributes(attributes)
-            new_feature.setGeometry(feature.geometry())
-
-            # Add a feature in the sink
-            sink.addFeature(new_feature, QgsFeatureSink.FastInsert)
-
-            # Update the progress bar
-            feedback.setProgress(int(current * total))
+        current = 0
+        shapes = 0
+        hits = 0
+        try:
+            # The features computed so far are written out on cancel too
+            with output:
+                for (chunk, keys, found, sizes), (volumes, n_shapes) in steps:
+                    # Leaving the loop cancels the chunks still pending
+                    if feedback.isCanceled():
+                        break
+
+                    shapes += n_shapes
+                    if cache is not None:
+                        # Counted per feature, a geometry can repeat
+                        hits += sum(key in found for key in keys)
+                        with profiler.stage('cache update'):
+                            volumes = cache.fill(keys, 'volume', found,
+                                                 volumes.tolist())
+
+                    # Empty geometries get a volume of 0
+                    with profiler.stage('write features'):
+                        for feature, volume in zip(chunk, volumes):
+                            # Stop the algorithm if cancel button has been clicked
+                            if feedback.isCanceled():
+                                break
+
+                            if mode == self.MODE_UPDATE:
+                                self.__updates[feature.id()] = float(volume)
+                            else:
+                                new_feature = QgsFeature()
+                                new_feature.setFields(fields)
+
+                                if mode == self.MODE_TABLE:
+                                    attributes = [feature.id()]
+                                else:
+                                    attributes = feature.attributes()
+                                    new_feature.setGeometry(feature.geometry())
+                                attributes.append(float(volume))
+
+                                new_feature.setAttributes(attributes)
+
+                                # Add a feature in the sink
+                                output.addFeature(new_feature)
+
+                            current += 1
+
+                            # Update the progress bar
+                            progress.setProgress(int(current * total))
+
+                    # The volumes are computed per chunk, so only the sizes
+                    # of the geometries are recorded
+                    profiler.features([feature.id() for feature in chunk],
+                                      sizes)
+        finally:
+            results.close()
+            if executor is not None:
+                stop_pool(executor)
+
+        progress.setProgress(int(current * total), force=True)
+
+        if cache is not None and not feedback.isCanceled():
+            feedback.pushInfo(self.tr('Found {} of {} volumes in the cache {}')
+                              .format(hits, current, cache.path()))
+
+        meshed = current - hits
+        if meshed > 0 and not feedback.isCanceled():
+            feedback.pushInfo(self.tr(
+                'Meshed {} distinct shapes for {} features (dedup ratio {:.1%})'
+            ).format(shapes, meshed, 1 - shapes / meshed))
+
+        profiler.report(feedback)
 
         # Return the results of the algorithm. In this case our only result is
         # the feature sink which contains the processed features, but some
@@ -158,7 +302,111 @@ class ComputeVolumeAlgorithm(QgsProcessingAlgorithm):
         # statistics, etc. These should all be included in the returned
         # dictionary, with keys matching the feature corresponding parameter
         # or output names.
-        return {self.OUTPUT: dest_id}
+        results = {self.OUTPUT: dest_id}
+        if profile_file:
+            profiler.write(profile_file, algorithm=self.name(),
+                           features=current, workers=workers)
+            results[self.PROFILE_FILE] = profile_file
+
+        return results
+
+    def postProcessAlgorithm(self, context, feedback):
+        """
+        Writes the volumes to the input layer when it is updated in place.
+        This runs on the main thread, once all features have been read.
+        """
+        if self.__update_layer_id is None:
+            return {}
+
+        layer = QgsProcessingUtils.mapLayerFromString(self.__update_layer_id,
+                                                      context)
+        if layer is None:
+            raise QgsProcessingException(
+                self.tr('The input layer is no longer available'))
+
+        volume_field = QgsField('volume', QVariant.Double)
+        if layer.isEditable():
+            self.updateEditBuffer(layer, volume_field, self.__updates)
+        else:
+            self.updateProvider(layer, volume_field, self.__updates)
+
+        feedback.pushInfo(self.tr('Updated the volume of {} features of {}')
+                          .format(len(self.__updates), layer.name()))
+        self.__updates = {}
+        layer.triggerRepaint()
+
+        return {self.OUTPUT: layer.id()}
+
+    def updateEditBuffer(self, layer, field, values):
+        """Writes the values to a layer in edit mode through its edit buffer,
+        as a single undo command, adding the field if the layer does not have
+        it yet. The changes are saved when the user saves the edits."""
+        layer.beginEditCommand(self.tr('Compute volume'))
+        try:
+            if layer.fields().lookupField(field.name()) < 0 \
+                    and not layer.addAttribute(field):
+                raise QgsProcessingException(
+                    self.tr('Could not add the {} field to {}')
+                    .format(field.name(), layer.name()))
+
+            index = layer.fields().lookupField(field.name())
+            for fid, value in values.items():
+                layer.changeAttributeValue(fid, index, value)
+        except Exception:
+            layer.destroyEditCommand()
+            raise
+
+        layer.endEditCommand()
+
+    def updateProvider(self, layer, field, values):
+        """Writes the values straight to the data provider of a layer that is
+        not in edit mode, in batches, adding the field if the layer does not
+        have it yet"""
+        provider = layer.dataProvider()
+        capabilities = provider.capabilities()
+        if not capabilities & QgsVectorDataProvider.ChangeAttributeValues:
+            raise QgsProcessingException(
+                self.tr('The attributes of {} cannot be changed').format(layer.name()))
+
+        if layer.fields().lookupField(field.name()) < 0:
+            if not capabilities & QgsVectorDataProvider.AddAttributes:
+                raise QgsProcessingException(
+                    self.tr('No {} field can be added to {}')
+                    .format(field.name(), layer.name()))
+
+            if not provider.addAttributes([field]):
+                raise QgsProcessingException(
+                    self.tr('Could not add the {} field to {}')
+                    .format(field.name(), layer.name()))
+            layer.updateFields()
+
+        index = layer.fields().lookupField(field.name())
+        with BufferedAttributeChanges(provider, self.__batch_size) as output:
+            for fid, value in values.items():
+                output.changeAttributeValue(fid, index, value)
+
+        layer.updateFields()
+
+    def calls(self, chunks, cache, profiler):
+        """Yields every chunk, with its cache keys, the volumes found in the
+        cache and the WKB sizes, and the arguments of `shared_volumes` (the
+        WKB of the geometries still to mesh)"""
+        for chunk, wkbs, keys, found, missing in self.cachedChunks(
+                chunks, cache, ['volume'], None, profiler):
+            yield ((chunk, keys, found['volume'], [len(wkb) for wkb in wkbs]),
+                   (missing,))
+
+    def shapeVolumes(self, wkbs, profiler):
+        """Returns the volume of every WKB geometry and the number of distinct
+        shapes, like the workers of `shared_volumes`, timing its stages"""
+        with profiler.stage('WKB to mesh'):
+            batch = SurfaceBatch.from_wkbs(wkbs)
+        with profiler.stage('deduplicate'):
+            unique, inverse = batch.deduplicate()
+        with profiler.stage('volume'):
+            volumes = unique.volumes()[inverse]
+
+        return volumes, len(unique)
 
     def name(self):
         """
@@ -197,6 +445,29 @@ class ComputeVolumeAlgorithm(QgsProcessingAlgorithm):
     def shortHelpString(self):
         """Returns help string for the algorithm's UI"""
         return """This algorithm computes the volume of multipolygon objects.
+
+        With more than one worker process, the features are meshed in
+        parallel and written back in their original order. Features with
+        the same shape at different places are meshed only once.
+
+        With the persistent metrics cache, the volumes of geometries seen in
+        earlier runs are reused, and only new or changed geometries are
+        meshed. Use "Clear metrics cache" to empty it.
+
+        With profiling, the time spent in every stage (fetching features,
+        converting them to WKB and meshes, computing the volumes, writing
+        the output) and the largest geometries are reported in the log, and
+        written to the profile file if one is given. The volumes are
+        computed a chunk at a time, so no time is given per feature.
+
+        The output can be a copy of the input layer with a volume field, a
+        table with the feature id and the volume of every feature, or the
+        input layer itself, whose volume field is updated (and added if
+        missing) without rewriting the geometries. The input is only updated
+        once all volumes are computed; a layer in edit mode is updated
+        through its edit buffer, as one undo step, and the changes are saved
+        with the other edits. The output layer is not used when the input is
+        updated.
         """
 
     def tr(self, string):
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ 3DToolbox
+                                 A QGIS plugin
+ This plugin provides tools and functions for 3D geometries and volumes
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2021-08-11
+        copyright            : (C) 2021 by 3D geoinformation group
+        email                : steliosvitalis@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = '3D geoinformation group'
+__date__ = '2021-08-11'
+__copyright__ = '(C) 2021 by 3D geoinformation group'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from itertools import islice
+
+from qgis.core import (QgsProcessingParameterBoolean,
+                       QgsProcessingParameterDefinition,
+                       QgsProcessingParameterFileDestination,
+                       QgsProcessingParameterNumber)
+from ..core.cache import geometry_key
+from ..core.mesh import geometry_wkb
+from ..settings import disk_cache
+from .profiling import StageProfiler
+
+
+class ChunkedAlgorithm:
+    """
+    A mixin for the algorithms that mesh the features of a layer in chunks
+    of CHUNK_SIZE features. It defines their common parameters (worker
+    processes, tolerance, persistent cache, write batch size and profiling)
+    and reads the chunks, with the metrics already in the cache.
+
+    It goes before QgsProcessingAlgorithm in the bases of the algorithm.
+    """
+
+    WORKERS = 'WORKERS'
+    TOLERANCE = 'TOLERANCE'
+    USE_CACHE = 'USE_CACHE'
+    BATCH_SIZE = 'BATCH_SIZE'
+    PROFILE = 'PROFILE'
+    PROFILE_FILE = 'PROFILE_FILE'
+
+    # The number of features that are meshed together
+    CHUNK_SIZE = 1000
+
+    def addWorkersParameter(self):
+        """
+        Features are meshed in worker processes when more than one worker
+        is requested.
+        """
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.WORKERS,
+                self.tr('Number of worker processes'),
+                QgsProcessingParameterNumber.Integer,
+                1,
+                False,
+                1
+            )
+        )
+
+    def addToleranceParameter(self):
+        """
+        Vertices closer than the tolerance are welded together before the
+        topology (holes and solidity) is computed. With 0, only identical
+        vertices are merged.
+        """
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOLERANCE,
+                self.tr('Tolerance for merging vertices'),
+                QgsProcessingParameterNumber.Double,
+                0.0,
+                False,
+                0.0
+            )
+        )
+
+    def addCacheParameter(self):
+        """
+        Metrics computed in earlier runs are read from the persistent cache,
+        so that only new or changed geometries are meshed.
+        """
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.USE_CACHE,
+                self.tr('Use the persistent metrics cache'),
+                False
+            )
+        )
+
+    def addBatchSizeParameter(self):
+        """
+        Features are written to the sink in batches of this size.
+        """
+        batch_size = QgsProcessingParameterNumber(
+            self.BATCH_SIZE,
+            self.tr('Number of features written at once'),
+            QgsProcessingParameterNumber.Integer,
+            1000,
+            False,
+            1
+        )
+        batch_size.setFlags(batch_size.flags()
+                            | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(batch_size)
+
+    def addProfileParameters(self):
+        """
+        The time of every stage is reported when profiling, and written to
+        the profile file if one is given.
+        """
+        profile = QgsProcessingParameterBoolean(
+            self.PROFILE,
+            self.tr('Report the time of every stage'),
+            False
+        )
+        profile.setFlags(profile.flags()
+                         | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(profile)
+
+        profile_file = QgsProcessingParameterFileDestination(
+            self.PROFILE_FILE,
+            self.tr('Profile'),
+            self.tr('JSON files (*.json)'),
+            None,
+            True,
+            False
+        )
+        profile_file.setFlags(profile_file.flags()
+                              | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(profile_file)
+
+    def parameterAsTolerance(self, parameters, context):
+        """
+        Returns the tolerance, or None to only merge identical vertices.
+        """
+        return self.parameterAsDouble(parameters, self.TOLERANCE, context) or None
+
+    def parameterAsCache(self, parameters, context):
+        """
+        Returns the persistent metrics cache if it is used, or None.
+        """
+        if self.parameterAsBoolean(parameters, self.USE_CACHE, context):
+            return disk_cache()
+
+        return None
+
+    def parameterAsProfiler(self, parameters, context):
+        """
+        Returns the profiler, enabled by profiling or a profile file, and
+        the path of the profile file.
+        """
+        profile_file = self.parameterAsFileOutput(parameters, self.PROFILE_FILE,
+                                                  context)
+        profiler = StageProfiler(
+            self.parameterAsBoolean(parameters, self.PROFILE, context)
+            or bool(profile_file))
+
+        return profiler, profile_file
+
+    def chunks(self, features, feedback, profiler):
+        """
+        Yields lists of up to CHUNK_SIZE features, until the features run
+        out or the algorithm is cancelled.
+        """
+        while not feedback.isCanceled():
+            with profiler.stage('fetch features'):
+                chunk = list(islice(features, self.CHUNK_SIZE))
+            if len(chunk) == 0:
+                return
+
+            yield chunk
+
+    def cachedChunks(self, chunks, cache, names, tolerance, profiler):
+        """
+        Yields every chunk with the WKB of its geometries, their cache keys
+        (None without a cache, and for empty geometries, which are never
+        cached), the metrics found in the cache per name, and the WKB of
+        the geometries that miss any of the metrics.
+        """
+        for chunk in chunks:
+            with profiler.stage('geometry to WKB'):
+                wkbs = [geometry_wkb(feature.geometry()) for feature in chunk]
+            keys, found, missing = None, {name: {} for name in names}, wkbs
+
+            if cache is not None:
+                with profiler.stage('cache lookup'):
+                    keys = [None if feature.geometry().isEmpty()
+                            else geometry_key(wkb, tolerance)
+                            for feature, wkb in zip(chunk, wkbs)]
+                    found = {name: cache.get_many([key for key in keys if key],
+                                                  name)
+                             for name in names}
+                missing = [wkb for wkb, key in zip(wkbs, keys)
+                           if not all(key in found[name] for name in names)]
+
+            yield chunk, wkbs, keys, found, missing
@@ -34,7 +34,6 @@ from PyQt5.QtCore import QVariant
 from qgis.PyQt.QtCore import QCoreApplication
 from qgis.core import (QgsProcessing,
                        QgsFeatureRequest,
-                       QgsFeatureSink,
                        QgsFeature,
                        QgsField,
                        QgsProcessingAlgorithm,
@@ -42,9 +41,12 @@ from qgis.core import (QgsProcessing,
                        QgsProcessingParameterFeatureSink,
                        QgsWkbTypes)
 from ...core.mesh import Mesh
+from ...core.surface import SurfaceBatch
+from ..chunked import ChunkedAlgorithm
+from ..sinks import BufferedSink, ThrottledProgress
 
 
-class ExtractHolesAlgorithm(QgsProcessingAlgorithm):
+class ExtractHolesAlgorithm(ChunkedAlgorithm, QgsProcessingAlgorithm):
     """
     This is an example algorithm that takes a vector layer and
     creates a new identical one.
@@ -91,6 +93,11 @@ class ExtractHolesAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        self.addToleranceParameter()
+        self.addCacheParameter()
+        self.addBatchSizeParameter()
+        self.addProfileParameters()
+
     def processAlgorithm(self, parameters, context, feedback):
         """
         Here is where the processing itself takes place.
@@ -121,33 +128,90 @@ class ExtractHolesAlgorithm(QgsProcessingAlgorithm):
         request = request.setInvalidGeometryCheck(0)
         features = source.getFeatures(request)
 
-        for current, feature in enumerate(features):
-            # Stop the algorithm if cancel button has been clicked
-            if feedback.isCanceled():
-                break
+        tolerance = self.parameterAsTolerance(parameters, context)
+        batch_size = self.parameterAsInt(parameters, self.BATCH_SIZE, context)
+        cache = self.parameterAsCache(parameters, context)
+        progress = ThrottledProgress(feedback)
+
+        profiler, profile_file = self.parameterAsProfiler(parameters, context)
+
+        chunks = self.cachedChunks(self.chunks(features, feedback, profiler),
+                                   cache, ['holes'], tolerance, profiler)
+
+        current = 0
+        shapes = 0
+        meshed = 0
+        # The features computed so far are written out on cancel too
+        with BufferedSink(sink, batch_size) as output:
+            for chunk, wkbs, keys, found, missing in chunks:
+                sizes = [len(wkb) for wkb in wkbs]
+
+                # Copies of the same shape are counted once
+                with profiler.stage('WKB to mesh'):
+                    batch = SurfaceBatch.from_wkbs(missing, tolerance)
+                with profiler.stage('deduplicate'):
+                    unique, inverse = batch.deduplicate()
+                with profiler.stage('clean and count holes'):
+                    hole_counts = unique.num_of_holes()[inverse].tolist()
+                shapes += len(unique)
+                meshed += len(missing)
+
+                if cache is not None:
+                    with profiler.stage('cache update'):
+                        hole_counts = cache.fill(keys, 'holes', found['holes'],
+                                                 hole_counts)
+
+                # Only the features with holes need a mesh of their own, and
+                # their hole lines are timed per feature
+                own = [0.0] * len(chunk)
 
-            mesh = Mesh(feature.geometry())
+                for i, (feature, hole_count) in enumerate(zip(chunk, hole_counts)):
+                    # Stop the algorithm if cancel button has been clicked
+                    if feedback.isCanceled():
+                        break
 
-            if mesh.isEmpty():
-                continue
+                    current += 1
 
-            if mesh.num_of_holes() == 0:
-                continue
+                    # Update the progress bar
+                    progress.setProgress(int(current * total))
 
-            new_feature = QgsFeature()
-            new_feature.setFields(fields)
+                    if hole_count == 0:
+                        continue
 
-            attributes = feature.attributes()
-            attributes.append(mesh.num_of_holes())
+                    before = profiler.elapsed()
+                    with profiler.stage('hole lines'):
+                        mesh = Mesh(feature.geometry(), tolerance)
+                        holes = mesh.getHoles()
 
-            new_feature.setAttributes(attributes)
-            new_feature.setGeometry(mesh.getHoles())
+                    with profiler.stage('write features'):
+                        new_feature = QgsFeature()
+                        new_feature.setFields(fields)
 
-            # Add a feature in the sink
-            sink.addFeature(new_feature, QgsFeatureSink.FastInsert)
+                        attributes = feature.attributes()
+                        attributes.append(int(hole_count))
 
-            # Update the progress bar
-            feedback.setProgress(int(current * total))
+                        new_feature.setAttributes(attributes)
+                        new_feature.setGeometry(holes)
+
+                        # Add a feature in the sink
+                        output.addFeature(new_feature)
+                    own[i] = profiler.elapsed() - before
+
+                profiler.features([feature.id() for feature in chunk], sizes,
+                                  own)
+
+        progress.setProgress(int(current * total), force=True)
+
+        if cache is not None and not feedback.isCanceled():
+            feedback.pushInfo(self.tr('Found {} of {} hole counts in the cache {}')
+                              .format(current - meshed, current, cache.path()))
+
+        if meshed > 0 and not feedback.isCanceled():
+            feedback.pushInfo(self.tr(
+                'Meshed {} distinct shapes for {} features (dedup ratio {:.1%})'
+            ).format(shapes, meshed, 1 - shapes / meshed))
+
+        profiler.report(feedback)
 
         # Return the results of the algorithm. In this case our only result is
         # the feature sink which contains the processed features, but some
@@ -155,7 +219,13 @@ class ExtractHolesAlgorithm(QgsProcessingAlgorithm):
         # statistics, etc. These should all be included in the returned
         # dictionary, with keys matching the feature corresponding parameter
         # or output names.
-        return {self.OUTPUT: dest_id}
+        results = {self.OUTPUT: dest_id}
+        if profile_file:
+            profiler.write(profile_file, algorithm=self.name(),
+                           features=current, tolerance=tolerance)
+            results[self.PROFILE_FILE] = profile_file
+
+        return results
 
     def name(self):
         """
@@ -193,7 +263,30 @@ class ExtractHolesAlgorithm(QgsProcessingAlgorithm):
 
     def shortHelpString(self):
         """Returns help string for the algorithm's UI"""
-        return """This algorithm computes the volume of multipolygon objects.
+        return """This algorithm finds the holes of open meshes, e.g. the
+        missing faces of a building that should be a closed volume.
+
+        Every feature with at least one hole is written as a MultiLineStringZ
+        with one closed line per hole, the boundary loop of the missing
+        surface, and its attributes with an added hole_count field. Closed
+        features are not written. Holes that only touch at a vertex count
+        separately.
+
+        The tolerance welds vertices closer than this distance before the
+        holes are found, so that faces which almost meet are treated as
+        connected. With 0, only identical vertices are merged.
+
+        With the persistent metrics cache, the hole counts of geometries
+        seen in earlier runs (with the same tolerance) are reused, and only
+        new or changed geometries are meshed to count their holes. The hole
+        lines of the features that have holes are always built. Use "Clear
+        metrics cache" to empty it.
+
+        With profiling, the time spent in every stage, the largest
+        geometries and the features whose hole lines took longest are
+        reported in the log, and written to the profile file if one is
+        given. The hole counts are computed a chunk at a time, so only the
+        hole lines are timed per feature.
         """
 
     def tr(self, string):
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ 3DToolbox
+                                 A QGIS plugin
+ This plugin provides tools and functions for 3D geometries and volumes
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2021-08-11
+        copyright            : (C) 2021 by 3D geoinformation group
+        email                : steliosvitalis@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = '3D geoinformation group'
+__date__ = '2021-08-11'
+__copyright__ = '(C) 2021 by 3D geoinformation group'
+
+import heapq
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class StageProfiler:
+    """
+    Collects the cumulative time and the number of calls of the stages of an
+    algorithm, the largest geometries, and the slowest features of the
+    stages that are timed per feature.
+
+    Stages can be nested: the time of a stage does not include the time of
+    the stages run inside it. A disabled profiler does not time anything.
+    """
+
+    def __init__(self, enabled=True, top=10):
+        self.__enabled = enabled
+        self.__top = top
+        self.__seconds = {}
+        self.__calls = {}
+        self.__largest = []
+        self.__slowest = []
+        self.__children = []
+        self.__elapsed = 0.0
+
+    def enabled(self):
+        """
+        Returns True if the profiler times the stages.
+        """
+        return self.__enabled
+
+    def stage(self, name):
+        """
+        Returns a context manager that times a call of a stage.
+        """
+        if not self.__enabled:
+            return nullcontext()
+
+        return self.__time(name)
+
+    def iterate(self, name, iterable):
+        """
+        Yields the items of an iterable, timing every step as a call of a
+        stage, e.g. to time waiting for the results of worker processes.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+
+            yield item
+
+    @contextmanager
+    def __time(self, name):
+        self.__children.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self.__children.pop()
+            if self.__children:
+                self.__children[-1] += elapsed
+            else:
+                self.__elapsed += elapsed
+
+            self.__seconds[name] = self.__seconds.get(name, 0.0) + elapsed - children
+            self.__calls[name] = self.__calls.get(name, 0) + 1
+
+    def elapsed(self):
+        """
+        Returns the total time of the stages so far, in seconds.
+        """
+        return self.__elapsed
+
+    def features(self, fids, sizes, seconds=None):
+        """
+        Records the features of a chunk: the size of their geometries (e.g.
+        their WKB sizes), and the `seconds` of the stages that are timed
+        per feature, if any. The batched stages are not split over the
+        features, so features without such stages have no time.
+        """
+        if not self.__enabled or len(fids) == 0:
+            return
+
+        for fid, size in zip(fids, sizes):
+            self.__keep(self.__largest, (size, fid))
+
+        for fid, elapsed in zip(fids, seconds or []):
+            if elapsed > 0:
+                self.__keep(self.__slowest, (elapsed, fid))
+
+    def __keep(self, heap, entry):
+        if len(heap) < self.__top:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+
+    def results(self):
+        """
+        Returns the stages (with their time and number of calls), the
+        largest geometries and the slowest features (see `features`) as a
+        dictionary.
+        """
+        return {
+            'seconds': self.__elapsed,
+            'stages': {
+                name: {'seconds': seconds, 'calls': self.__calls[name]}
+                for name, seconds in sorted(self.__seconds.items(),
+                                            key=lambda item: -item[1])
+            },
+            'largest': [
+                {'id': fid, 'size': size}
+                for size, fid in sorted(self.__largest, reverse=True)
+            ],
+            'slowest': [
+                {'id': fid, 'seconds': seconds}
+                for seconds, fid in sorted(self.__slowest, reverse=True)
+            ],
+        }
+
+    def report(self, feedback):
+        """
+        Reports the stages, the largest geometries and the slowest features
+        with pushInfo.
+        """
+        if not self.__enabled:
+            return
+
+        results = self.results()
+        total = results['seconds'] or 1
+
+        feedback.pushInfo('Time per stage:')
+        for name, stage in results['stages'].items():
+            feedback.pushInfo('  {}: {:.3f} s ({:.1%}) in {} calls'.format(
+                name, stage['seconds'], stage['seconds'] / total, stage['calls']))
+
+        if results['largest']:
+            feedback.pushInfo('Largest geometries:')
+            for feature in results['largest']:
+                feedback.pushInfo('  {}: {} bytes'.format(feature['id'],
+                                                           feature['size']))
+
+        if results['slowest']:
+            feedback.pushInfo('Slowest features:')
+            for feature in results['slowest']:
+                feedback.pushInfo('  {}: {:.2f} ms'.format(
+                    feature['id'], feature['seconds'] * 1000))
+
+    def write(self, path, **meta):
+        """
+        Writes the results, along with the given metadata, to a JSON file.
+        """
+        results = dict(meta)
+        results.update(self.results())
+
+        with open(path, 'w') as output:
+            json.dump(results, output, indent=2)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ 3DToolbox
+                                 A QGIS plugin
+ This plugin provides tools and functions for 3D geometries and volumes
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2021-08-11
+        copyright            : (C) 2021 by 3D geoinformation group
+        email                : steliosvitalis@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = '3D geoinformation group'
+__date__ = '2021-08-11'
+__copyright__ = '(C) 2021 by 3D geoinformation group'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+import time
+
+from qgis.core import QgsFeatureSink, QgsProcessingException
+
+
+class BufferedSink:
+    """
+    Collects features and writes them to a feature sink in batches with
+    addFeatures, instead of one addFeature call per feature.
+
+    Use it as a context manager, so that the remaining features are flushed
+    even when the algorithm is cancelled.
+    """
+
+    def __init__(self, sink, batch_size=1000):
+        self.__sink = sink
+        self.__batch_size = max(int(batch_size), 1)
+        self.__features = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def addFeature(self, feature):
+        """
+        Adds a feature to the buffer, writing the buffer out when it is full.
+        """
+        self.__features.append(feature)
+
+        if len(self.__features) >= self.__batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all the buffered features to the sink.
+        """
+        if len(self.__features) == 0:
+            return
+
+        features, self.__features = self.__features, []
+        if not self.__sink.addFeatures(features, QgsFeatureSink.FastInsert):
+            raise QgsProcessingException(
+                'Could not write {} features to the output'.format(len(features)))
+
+
+class BufferedAttributeChanges:
+    """
+    Collects attribute changes of existing features and writes them to a
+    data provider in batches with changeAttributeValues, so that a layer can
+    be updated in place without rewriting its geometries.
+
+    Use it as a context manager, so that the remaining changes are flushed
+    even when the algorithm is cancelled.
+    """
+
+    def __init__(self, provider, batch_size=1000):
+        self.__provider = provider
+        self.__batch_size = max(int(batch_size), 1)
+        self.__changes = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+    def changeAttributeValue(self, fid, index, value):
+        """
+        Adds the change of one attribute of a feature to the buffer, writing
+        the buffer out when it is full.
+        """
+        self.__changes.setdefault(fid, {})[index] = value
+
+        if len(self.__changes) >= self.__batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes all the buffered changes to the data provider.
+        """
+        if len(self.__changes) == 0:
+            return
+
+        changes, self.__changes = self.__changes, {}
+        if not self.__provider.changeAttributeValues(changes):
+            raise QgsProcessingException(
+                'Could not update {} features of the input'.format(len(changes)))
+
+
+class ThrottledProgress:
+    """
+    Forwards progress updates to the feedback object at most once every
+    `interval` seconds.
+    """
+
+    def __init__(self, feedback, interval=0.1):
+        self.__feedback = feedback
+        self.__interval = interval
+        self.__last = 0.0
+
+    def setProgress(self, progress, force=False):
+        """
+        Sets the progress (0-100) if enough time has passed since the last
+        update, or if `force` is set.
+        """
+        now = time.monotonic()
+
+        if force or now - self.__last >= self.__interval:
+            self.__feedback.setProgress(progress)
+            self.__last = now
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""
+/***************************************************************************
+ 3DToolbox
+                                 A QGIS plugin
+ This plugin provides tools and functions for 3D geometries and volumes
+ Generated by Plugin Builder: http://g-sherman.github.io/Qgis-Plugin-Builder/
+                              -------------------
+        begin                : 2021-08-11
+        copyright            : (C) 2021 by 3D geoinformation group
+        email                : steliosvitalis@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+__author__ = '3D geoinformation group'
+__date__ = '2021-08-11'
+__copyright__ = '(C) 2021 by 3D geoinformation group'
+
+# This will get replaced with a git SHA1 when you do a git archive
+
+__revision__ = '$Format:%H$'
+
+from qgis.core import QgsProcessingAlgorithm
+from qgis.PyQt.QtCore import QCoreApplication
+from ...settings import disk_cache
+
+
+class ClearCacheAlgorithm(QgsProcessingAlgorithm):
+    """
+    Empties the persistent metrics cache and the in-memory cache of the
+    expression functions.
+    """
+
+    def initAlgorithm(self, config):
+        """
+        The algorithm has no parameters.
+        """
+
+        pass
+
+    def processAlgorithm(self, parameters, context, feedback):
+        """
+        Here is where the processing itself takes place.
+        """
+
+        from ...functions import metrics_cache
+
+        cache = disk_cache()
+        stats = cache.stats()
+
+        cache.clear()
+        metrics_cache.clear()
+
+        feedback.pushInfo(self.tr('Removed {} entries ({:.1f} MB) from {}').format(
+            stats['size'], stats['nbytes'] / 2**20, cache.path()))
+
+        return {}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm. This
+        string should be fixed for the algorithm, and must not be localised.
+        The name should be unique within each provider. Names should contain
+        lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return 'Clear metrics cache'
+
+    def displayName(self):
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return self.tr(self.name())
+
+    def group(self):
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return self.tr(self.groupId())
+
+    def groupId(self):
+        """
+        Returns the unique ID of the group this algorithm belongs to. This
+        string should be fixed for the algorithm, and must not be localised.
+        The group id should be unique within each provider. Group id should
+        contain lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return 'System'
+
+    def shortHelpString(self):
+        """Returns help string for the algorithm's UI"""
+        return """Removes all the metrics stored in the persistent cache, and
+        the metrics cached in memory by the expression functions.
+        """
+
+    def tr(self, string):
+        return QCoreApplication.translate('Processing', string)
+
+    def createInstance(self):
+        return ClearCacheAlgorithm()
@@ -31,6 +31,7 @@ __copyright__ = '(C) 2021 by 3D geoinformation group'
 __revision__ = '$Format:%H$'
 
 from qgis.core import QgsProcessingProvider
+from .system.clear_cache_algorithm import ClearCacheAlgorithm
 from .system.install_pyvista_algorithm import InstallPyvistaAlgorithm
 
 
@@ -55,11 +56,14 @@ class ThreeToolboxProvider(QgsProcessingProvider):
         Loads all algorithms belonging to this provider.
         """
         if self.__with_pyvista:
+            from .analysis.compute_metrics_algorithm import ComputeMetricsAlgorithm
             from .analysis.compute_volume_algorithm import ComputeVolumeAlgorithm
             from .geometry.extract_holes_algorithm import ExtractHolesAlgorithm
 
             self.addAlgorithm(ComputeVolumeAlgorithm())
+            self.addAlgorithm(ComputeMetricsAlgorithm())
             self.addAlgorithm(ExtractHolesAlgorithm())
+            self.addAlgorithm(ClearCacheAlgorithm())
         else:
             self.addAlgorithm(InstallPyvistaAlgorithm())
         # add additional algorithms here
@@ -0,0 +1,310 @@
+"""Runs 3D metrics over whole layers in the background.
+
+A layer's feature ids are split over a few `QgsTask` subtasks of one task on
+`QgsApplication.taskManager()`, so they run on several threads while the UI
+stays responsive. Every subtask reads its features from a
+`QgsVectorLayerFeatureSource` snapshot of the layer one chunk at a time and
+hands the metrics of every chunk to the main thread, which writes them back
+to the layer right away, so only the chunks in flight are held in memory.
+
+Layers in edit mode are refused, since the metrics are written straight to
+their data provider.
+
+With more than one worker process, the subtasks hand their geometries to a
+shared process pool, so the metrics are not limited by the GIL.
+"""
+
+import os
+from concurrent import futures
+
+from PyQt5.QtCore import QVariant, pyqtSignal
+from qgis.core import (Qgis,
+                       QgsApplication,
+                       QgsFeatureRequest,
+                       QgsField,
+                       QgsMessageLog,
+                       QgsProject,
+                       QgsTask,
+                       QgsVectorDataProvider,
+                       QgsVectorLayerFeatureSource)
+from .core.mesh import geometry_wkb
+from .core.parallel import chunk_metrics, process_pool, stop_pool
+from .core.surface import compute_metrics
+from .processing.sinks import BufferedAttributeChanges
+
+# The type of the field of every metric (see `core.surface.METRICS`)
+FIELD_TYPES = {
+    "volume": QVariant.Double,
+    "area": QVariant.Double,
+    "is_solid": QVariant.Bool,
+    "holes": QVariant.Int,
+    "z_min": QVariant.Double,
+    "z_max": QVariant.Double,
+    "slope": QVariant.Double,
+    "slope_min": QVariant.Double,
+    "slope_max": QVariant.Double,
+    "slope_mean": QVariant.Double,
+}
+
+class ChunkTask(QgsTask):
+    """A subtask that computes the metrics of a range of features, one chunk
+    at a time, and emits `chunkComputed` with the metrics of every chunk"""
+
+    # Emitted with a dict of the metrics by feature id for every chunk. The
+    # task lives on the main thread, so the slots connected to it run there.
+    chunkComputed = pyqtSignal(object)
+
+    # How often a subtask checks for cancellation while it waits for a worker
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, source, fids, names, tolerance=None, executor=None,
+                 chunk_size=1000):
+        super().__init__("3D metrics of {} features".format(len(fids)),
+                         QgsTask.CanCancel)
+
+        self.__source = source
+        self.__fids = fids
+        self.__names = names
+        self.__tolerance = tolerance
+        self.__executor = executor
+        self.__chunk_size = chunk_size
+        self.error = None
+
+    def run(self):
+        try:
+            return self.compute()
+        except Exception as error:
+            # Exceptions must not leave the thread of the task
+            self.error = str(error)
+            QgsMessageLog.logMessage(self.error, "3D Toolbox", Qgis.Critical)
+
+            return False
+
+    def compute(self):
+        """Computes the metrics of all chunks of the task. Returns False if
+        the task was cancelled."""
+        for start in range(0, len(self.__fids), self.__chunk_size):
+            results = self.computeChunk(self.__fids[start:start + self.__chunk_size])
+            if results is None:
+                return False
+
+            self.chunkComputed.emit(results)
+            self.setProgress(100 * (start + len(results)) / len(self.__fids))
+
+        return True
+
+    def computeChunk(self, fids):
+        """Reads the geometries of a chunk and returns their metrics by
+        feature id, or None if the task was cancelled"""
+        request = QgsFeatureRequest().setFilterFids(fids)
+        request.setNoAttributes()
+        request.setInvalidGeometryCheck(QgsFeatureRequest.GeometryNoCheck)
+
+        chunk_fids, wkbs = [], []
+        for feature in self.__source.getFeatures(request):
+            if self.isCanceled():
+                return None
+
+            chunk_fids.append(feature.id())
+            wkbs.append(geometry_wkb(feature.geometry()))
+
+        if self.__executor is not None:
+            future = self.__executor.submit(chunk_metrics, wkbs, self.__names,
+                                            self.__tolerance)
+            while True:
+                try:
+                    metrics = future.result(timeout=self.POLL_INTERVAL)
+                    break
+                except futures.TimeoutError:
+                    if self.isCanceled():
+                        future.cancel()
+                        return None
+        else:
+            metrics = []
+            for wkb in wkbs:
+                if self.isCanceled():
+                    return None
+
+                metrics.append(compute_metrics(wkb, self.__tolerance, self.__names))
+
+        return dict(zip(chunk_fids, metrics))
+
+class MetricsTask(QgsTask):
+    """A task that computes metrics over a layer with a few subtasks, and
+    writes the metrics of every chunk back to the layer as soon as it is
+    computed"""
+
+    def __init__(self, layer, names, tolerance=None, chunk_size=1000,
+                 executor=None, selected_only=False, batch_size=1000,
+                 subtasks=None):
+        super().__init__("3D metrics of {}".format(layer.name()),
+                         QgsTask.CanCancel)
+
+        if layer.isEditable():
+            raise ValueError("{} is in edit mode, save or discard the edits "
+                             "first".format(layer.name()))
+
+        self.__layer_id = layer.id()
+        self.__names = list(names)
+        self.__batch_size = batch_size
+        self.written = 0
+        self.error = None
+
+        self.__indices = self.prepareFields(layer)
+
+        # Every subtask reads its own snapshot of the layer, and holds no
+        # more than one chunk at a time
+        fids = sorted(layer.selectedFeatureIds() if selected_only
+                      else layer.allFeatureIds())
+        subtasks = subtasks or os.cpu_count() or 1
+        size = max(-(-len(fids) // subtasks), 1)
+        for i in range(0, len(fids), size):
+            chunk = ChunkTask(QgsVectorLayerFeatureSource(layer),
+                              fids[i:i + size], self.__names, tolerance,
+                              executor, chunk_size)
+            chunk.chunkComputed.connect(self.writeChunk)
+            self.addSubTask(chunk, [], QgsTask.ParentDependsOnSubTask)
+
+    def prepareFields(self, layer):
+        """Adds the fields of the metrics the layer does not have yet, and
+        returns the index of the field of every metric"""
+        provider = layer.dataProvider()
+        capabilities = provider.capabilities()
+        if not capabilities & QgsVectorDataProvider.ChangeAttributeValues:
+            raise ValueError("The attributes of {} cannot be changed"
+                             .format(layer.name()))
+
+        missing = [QgsField(name, FIELD_TYPES[name]) for name in self.__names
+                   if layer.fields().lookupField(name) < 0]
+        if missing:
+            if not capabilities & QgsVectorDataProvider.AddAttributes \
+                    or not provider.addAttributes(missing):
+                raise ValueError("Could not add the metric fields to {}"
+                                 .format(layer.name()))
+            layer.updateFields()
+
+        return {name: layer.fields().lookupField(name) for name in self.__names}
+
+    def run(self):
+        # The work is done by the subtasks
+        return True
+
+    def writeChunk(self, results):
+        """Writes the metrics of a chunk back to the layer, on the main
+        thread. The task is cancelled if the layer was removed or put in
+        edit mode meanwhile."""
+        if self.error is not None:
+            return
+
+        layer = QgsProject.instance().mapLayer(self.__layer_id)
+        try:
+            if layer is None:
+                raise ValueError("The layer was removed")
+            if layer.isEditable():
+                raise ValueError("{} was put in edit mode".format(layer.name()))
+
+            with BufferedAttributeChanges(layer.dataProvider(),
+                                          self.__batch_size) as output:
+                for fid, metrics in results.items():
+                    # Empty geometries get NULL metrics
+                    for name in self.__names:
+                        output.changeAttributeValue(
+                            fid, self.__indices[name],
+                            metrics[name] if metrics else None)
+            self.written += len(results)
+        except Exception as error:
+            self.error = str(error)
+            QgsMessageLog.logMessage(self.error, "3D Toolbox", Qgis.Critical)
+            self.cancel()
+
+    def finished(self, result):
+        """Repaints the layer once all chunks are written"""
+        layer = QgsProject.instance().mapLayer(self.__layer_id)
+        if layer is not None:
+            layer.triggerRepaint()
+
+class MetricsScheduler:
+    """Schedules metric tasks on the task manager, keeping them alive until
+    they finish"""
+
+    def __init__(self, task_manager=None, workers=1):
+        """Creates a scheduler.
+
+        Parameters
+        ----------
+        task_manager : QgsTaskManager, optional
+            The task manager, by default the one of the application
+        workers : int, optional
+            The number of worker processes shared by all tasks, by default 1,
+            i.e. the metrics are computed on the threads of the subtasks
+        """
+        self.__task_manager = task_manager or QgsApplication.taskManager()
+        self.__workers = workers
+        self.__executor = None
+        self.__tasks = []
+
+    def submit(self, layer, names=("volume",), tolerance=None, chunk_size=1000,
+               selected_only=False) -> MetricsTask:
+        """Computes metrics over a layer in the background.
+
+        Parameters
+        ----------
+        layer : QgsVectorLayer
+            The layer, whose fields of the metrics are updated (and added if
+            missing). It must not be in edit mode.
+        names : iterable, optional
+            The metrics to compute (see `FIELD_TYPES`), by default the volume
+        tolerance : float, optional
+            The tolerance used to merge vertices together, by default None
+        chunk_size : int, optional
+            The number of features read and written at once, by default 1000
+        selected_only : bool, optional
+            Only compute the selected features, by default False
+
+        Returns
+        -------
+        MetricsTask
+            The task, whose taskCompleted and taskTerminated signals tell
+            when the metrics are written
+
+        Raises
+        ------
+        ValueError
+            If the layer is in edit mode or its attributes cannot be changed
+        """
+        if self.__workers > 1 and self.__executor is None:
+            self.__executor = process_pool(self.__workers)
+
+        # With worker processes, one subtask per worker keeps them all busy
+        subtasks = self.__workers if self.__executor is not None else None
+        task = MetricsTask(layer, names, tolerance, chunk_size,
+                           self.__executor, selected_only, subtasks=subtasks)
+
+        self.__tasks.append(task)
+        task.taskCompleted.connect(lambda: self.__forget(task))
+        task.taskTerminated.connect(lambda: self.__forget(task))
+
+        self.__task_manager.addTask(task)
+
+        return task
+
+    def tasks(self) -> list:
+        """Returns the tasks that did not finish yet"""
+        return list(self.__tasks)
+
+    def cancel(self):
+        """Cancels all tasks. The subtasks stop at their next check."""
+        for task in self.__tasks:
+            task.cancel()
+
+    def shutdown(self):
+        """Cancels all tasks and stops the worker processes"""
+        self.cancel()
+
+        if self.__executor is not None:
+            stop_pool(self.__executor)
+            self.__executor = None
+
+    def __forget(self, task):
+        if task in self.__tasks:
+            self.__tasks.remove(task)
@@ -0,0 +1,64 @@
+"""The settings of the plugin, stored with QgsSettings.
+
+- `three_toolbox/cache_size`: the number of geometries kept in memory by the
+  expression functions (4096)
+- `three_toolbox/disk_cache`: whether the expression functions also use the
+  persistent metrics cache (false)
+- `three_toolbox/disk_cache_path`: the SQLite database of the persistent
+  cache (`three_toolbox/metrics.sqlite` in the profile folder)
+- `three_toolbox/disk_cache_size`: the maximum size of the persistent cache,
+  in MB (256)
+- `three_toolbox/scheduler_workers`: the number of worker processes of the
+  background metrics (1, i.e. only the threads of the tasks)
+- `three_toolbox/scheduler_metrics`: the comma-separated metrics that the
+  "Compute 3D metrics in the background" action writes to the active layer
+  (volume)
+"""
+
+import os
+import threading
+
+from qgis.core import QgsApplication, QgsSettings
+from .core.cache import DiskCache
+
+_disk_cache = None
+_lock = threading.Lock()
+
+def memory_cache_size() -> int:
+    """Returns the number of geometries kept by the in-memory cache"""
+    return QgsSettings().value("three_toolbox/cache_size", 4096, type=int)
+
+def use_disk_cache() -> bool:
+    """Returns True if the expression functions use the persistent cache"""
+    return QgsSettings().value("three_toolbox/disk_cache", False, type=bool)
+
+def scheduler_workers() -> int:
+    """Returns the number of worker processes of the background metrics"""
+    return QgsSettings().value("three_toolbox/scheduler_workers", 1, type=int)
+
+def scheduler_metrics() -> list:
+    """Returns the metrics written by the background metrics action"""
+    value = QgsSettings().value("three_toolbox/scheduler_metrics", "volume",
+                                type=str)
+
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+def disk_cache_path() -> str:
+    """Returns the path of the persistent cache database"""
+    default = os.path.join(QgsApplication.qgisSettingsDirPath(),
+                           "three_toolbox", "metrics.sqlite")
+
+    return QgsSettings().value("three_toolbox/disk_cache_path", default, type=str)
+
+def disk_cache() -> DiskCache:
+    """Returns the persistent metrics cache, shared by the expression
+    functions and the processing algorithms. It is opened on first use."""
+    global _disk_cache
+
+    with _lock:
+        if _disk_cache is None:
+            max_bytes = QgsSettings().value("three_toolbox/disk_cache_size",
+                                            256, type=int) * 2**20
+            _disk_cache = DiskCache(disk_cache_path(), max_bytes)
+
+        return _disk_cache
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ..core.cache import DiskCache, MetricsCache, geometry_key, shape_keys
+from .test_kernels import CUBE_POINTS
+
+class TestMetricsCache(unittest.TestCase):
+
+    def test_geometry_key(self):
+        self.assertEqual(geometry_key(b'abc'), geometry_key(b'abc'))
+        self.assertNotEqual(geometry_key(b'abc'), geometry_key(b'abd'))
+        self.assertNotEqual(geometry_key(b'abc'), geometry_key(b'abc', 0.01))
+
+    def test_shape_keys(self):
+        points = np.vstack([CUBE_POINTS, CUBE_POINTS + [1e5, 2e5, 3.5],
+                            CUBE_POINTS * 2])
+        offsets = np.arange(0, 25, 4)
+
+        keys = shape_keys(points, offsets, [0, 2, 4, 6])
+
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+
+    def test_hits_and_misses(self):
+        cache = MetricsCache(maxsize=2)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 42
+
+        self.assertEqual(cache.get(b'a', 'volume', compute), 42)
+        self.assertEqual(cache.get(b'a', 'volume', compute), 42)
+        cache.get(b'a', 'area', compute)
+
+        stats = cache.stats()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertEqual(stats['size'], 1)
+
+    def test_eviction(self):
+        cache = MetricsCache(maxsize=2)
+
+        cache.put(b'a', 'volume', 1)
+        cache.put(b'b', 'volume', 2)
+        cache.get(b'a', 'volume', lambda: None)
+        cache.put(b'c', 'volume', 3)
+
+        # b was the least recently used entry
+        self.assertEqual(cache.get(b'b', 'volume', lambda: None), None)
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+        cache.resize(0)
+        self.assertEqual(len(cache), 0)
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'metrics.sqlite')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_persistence(self):
+        cache = DiskCache(self.path)
+        cache.put_many([(b'a', 1.5), (b'b', {'holes': 2})], 'volume')
+        cache.close()
+
+        cache = DiskCache(self.path)
+        self.assertEqual(cache.get_many([b'a', b'b', b'c'], 'volume'),
+                         {b'a': 1.5, b'b': {'holes': 2}})
+        self.assertEqual(cache.get_many([b'a'], 'area'), {})
+
+        found = cache.get_many([b'a', b'c'], 'volume')
+        self.assertEqual(cache.fill([b'a', b'c'], 'volume', found, [3.0]),
+                         [1.5, 3.0])
+        self.assertEqual(cache.get(b'c', 'volume', lambda: 0), 3.0)
+
+        # Empty geometries have no key and are never stored
+        self.assertEqual(cache.fill([None, b'a', None], 'volume', found,
+                                    [0.0, 0.0]), [0.0, 1.5, 0.0])
+        self.assertEqual(cache.get_many([None], 'volume'), {})
+        cache.close()
+
+    def test_version(self):
+        cache = DiskCache(self.path, version=1)
+        cache.put_many([(b'a', 1.5)], 'volume')
+        cache.close()
+
+        cache = DiskCache(self.path, version=2)
+        self.assertEqual(cache.stats()['size'], 0)
+        cache.close()
+
+    def test_eviction(self):
+        cache = DiskCache(self.path, max_bytes=64 * 1024)
+        for i in range(20):
+            cache.put_many([(os.urandom(16), i) for _ in range(500)], 'volume')
+
+        stats = cache.stats()
+        self.assertGreater(stats['evictions'], 0)
+        self.assertLess(stats['size'], 10000)
+
+        cache.clear()
+        self.assertEqual(cache.stats()['size'], 0)
+        cache.close()
+
+if __name__ == "__main__":
+    suite = unittest.TestSuite([unittest.makeSuite(TestMetricsCache),
+                                unittest.makeSuite(TestDiskCache)])
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
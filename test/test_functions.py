@@ -1,4 +1,7 @@
 import unittest
+
+import numpy as np
+
 from ..core.mesh import vector_angle
 
 class TestFunctions(unittest.TestCase):
@@ -7,6 +10,12 @@ class TestFunctions(unittest.TestCase):
         self.assertEqual(vector_angle([0, 0, 1], [0, 0, 1]), 0)
         self.assertEqual(vector_angle([0, 1, 0], [0, 0, 1]), 90)
 
+    def test_vector_angle_array(self):
+        normals = np.array([[0, 0, 1], [0, 1, 0], [0, 0, -2], [0, 0, 0]])
+        angles = vector_angle(normals, [0, 0, 1])
+
+        np.testing.assert_array_equal(angles, [0, 90, 180, np.nan])
+
 if __name__ == "__main__":
     suite = unittest.makeSuite(TestFunctions)
     runner = unittest.TextTestRunner(verbosity=2)
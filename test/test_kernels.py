@@ -0,0 +1,138 @@
+import time
+import unittest
+
+import numpy as np
+
+from ..core.kernels import (face_aspects, face_slopes, fan_triangles,
+                            merge_points, signed_volume, signed_volumes,
+                            weld_points,
+                            surface_area, surface_areas)
+
+CUBE_POINTS = np.array([
+    [0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+    [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1],
+], dtype=float)
+
+CUBE_CONNECTIVITY = np.array([
+    0, 3, 2, 1,
+    4, 5, 6, 7,
+    0, 1, 5, 4,
+    1, 2, 6, 5,
+    2, 3, 7, 6,
+    3, 0, 4, 7,
+])
+
+CUBE_OFFSETS = np.arange(0, 25, 4)
+
+class TestKernels(unittest.TestCase):
+
+    def test_fan_triangles(self):
+        triangles, faces = fan_triangles([0, 3, 8], np.arange(8))
+
+        self.assertEqual(triangles.tolist(),
+                         [[0, 1, 2], [3, 4, 5], [3, 5, 6], [3, 6, 7]])
+        self.assertEqual(faces.tolist(), [0, 1, 1, 1])
+
+    def test_signed_volume(self):
+        volume = signed_volume(CUBE_POINTS * 2 + 1e6, CUBE_OFFSETS,
+                               CUBE_CONNECTIVITY)
+        self.assertAlmostEqual(volume, 8)
+
+        flipped = CUBE_CONNECTIVITY.reshape(-1, 4)[:, ::-1].ravel()
+        self.assertAlmostEqual(
+            signed_volume(CUBE_POINTS, CUBE_OFFSETS, flipped), -1)
+
+    def test_surface_area(self):
+        self.assertAlmostEqual(
+            surface_area(CUBE_POINTS, CUBE_OFFSETS, CUBE_CONNECTIVITY), 6)
+
+    def test_surface_area_concave(self):
+        points = np.array([[0, 0, 0], [3, 0, 0], [3, 1, 0], [1, 1, 0],
+                           [1, 2, 0], [0, 2, 0]], dtype=float)
+
+        self.assertAlmostEqual(surface_area(points, [0, 6], np.arange(6)), 4)
+
+    def test_merge_points(self):
+        points = np.vstack([CUBE_POINTS, CUBE_POINTS + 1e-4, CUBE_POINTS])
+        groups = np.repeat([0, 0, 1], 8)
+
+        merged, inverse = merge_points(points, groups)
+        self.assertEqual(len(merged), 24)
+
+        merged, inverse = merge_points(points, groups, tolerance=1e-3)
+        self.assertEqual(len(merged), 16)
+        self.assertEqual(inverse[8], inverse[0])
+
+    def test_weld_points_across_cells(self):
+        # The points straddle a cell boundary of the tolerance grid
+        points = np.array([[0.0999, 0, 0], [0.1001, 0, 0], [0.3, 0, 0],
+                           [0.0999, 0, 0]])
+        groups = np.array([0, 0, 0, 1])
+
+        merged, inverse = weld_points(points, groups, 0.1)
+
+        self.assertEqual(len(merged), 3)
+        self.assertEqual(inverse[0], inverse[1])
+        self.assertNotEqual(inverse[0], inverse[2])
+        self.assertNotEqual(inverse[0], inverse[3])
+        np.testing.assert_allclose(merged[inverse[1]], points[0])
+
+    def test_weld_points_in_neighbouring_cells(self):
+        # The points are in neighbouring cells but 1.55 apart
+        points = np.array([[1.9, 0.9, 0.9], [1.01, 0, 0]])
+
+        merged, inverse = weld_points(points, None, 1.0)
+
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(inverse.tolist(), [0, 1])
+
+    def test_weld_points_is_not_transitive(self):
+        # Every point is within the tolerance of the next one, but a chain
+        # of points must not collapse into one
+        points = np.zeros((23, 3))
+        points[:, 0] = np.arange(23) * 0.09
+
+        merged, inverse = weld_points(points, None, 0.1)
+
+        self.assertEqual(len(merged), 12)
+        np.testing.assert_allclose(merged, points[::2])
+        self.assertEqual(inverse.tolist(), list(np.arange(23) // 2))
+        self.assertTrue(np.all(np.linalg.norm(points - merged[inverse], axis=1)
+                               <= 0.1))
+
+    def test_weld_points_long_chain(self):
+        # A long chain of close points must not take one round per link:
+        # 64k points took about 10 s when it did
+        points = np.zeros((64000, 3))
+        points[:, 0] = np.arange(64000) * 0.09
+
+        start = time.perf_counter()
+        merged, inverse = weld_points(points, None, 0.1)
+
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(len(merged), 32000)
+        self.assertEqual(inverse.tolist(), list(np.arange(64000) // 2))
+
+    def test_segmented_metrics(self):
+        # Two cubes, the second one scaled and far away
+        points = np.vstack([CUBE_POINTS, CUBE_POINTS * 2 + 1e6])
+        connectivity = np.concatenate([CUBE_CONNECTIVITY, CUBE_CONNECTIVITY + 8])
+        offsets = np.arange(0, 49, 4)
+        groups = np.repeat([0, 1], 6)
+
+        np.testing.assert_allclose(
+            signed_volumes(points, offsets, connectivity, groups, 3), [1, 8, 0])
+        np.testing.assert_allclose(
+            surface_areas(points, offsets, connectivity, groups, 3), [6, 24, 0])
+
+    def test_slopes_and_aspects(self):
+        vector_areas = np.array([[0, 0, 2], [0, 1, 1], [-1, 0, 0], [0, 0, 0]])
+
+        np.testing.assert_allclose(face_slopes(vector_areas), [0, 45, 90, np.nan])
+        np.testing.assert_allclose(face_aspects(vector_areas),
+                                   [np.nan, 0, 270, np.nan])
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestKernels)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,41 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import spawn
+
+from ..core.parallel import chunk_metrics, ordered_map, process_pool, stop_pool
+from .test_wkb import CUBE, multipolygon_wkb
+
+class TestParallel(unittest.TestCase):
+
+    def test_chunk_metrics(self):
+        metrics = chunk_metrics([multipolygon_wkb(CUBE), b''], ['volume', 'holes'])
+
+        self.assertEqual(metrics[0], {'volume': 1, 'holes': 0})
+        self.assertIsNone(metrics[1])
+
+    def test_ordered_map(self):
+        items = ((i, (i,)) for i in range(20))
+
+        with ThreadPoolExecutor(4) as executor:
+            results = list(ordered_map(executor, lambda x: x * x, items, 3))
+
+        self.assertEqual(results, [(i, i * i) for i in range(20)])
+
+    def test_process_pool(self):
+        # The executable of multiprocessing is global, so the pool must not
+        # change it for the rest of the process
+        executable = spawn.get_executable()
+        executor = process_pool(1)
+        try:
+            metrics = executor.submit(chunk_metrics, [multipolygon_wkb(CUBE)],
+                                      ['volume']).result()
+        finally:
+            stop_pool(executor)
+
+        self.assertEqual(metrics, [{'volume': 1}])
+        self.assertEqual(spawn.get_executable(), executable)
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestParallel)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+
+from ..core.kernels import face_vector_areas, signed_volume, signed_volumes
+from ..core.prism import prism_volumes
+from ..core.surface import SurfaceBatch, SurfaceMesh
+from ..core.wkb import pack_polygons
+from .test_wkb import CUBE, multipolygon_wkb
+
+def extrusion(footprint, height, base=0):
+    """Returns the rings of a footprint (counter-clockwise) extruded from
+    `base` to `base + height`"""
+    top = base + height
+    bottom = [(x, y, base) for x, y in reversed(footprint)]
+    roof = [(x, y, top) for x, y in footprint]
+    walls = [[(x0, y0, base), (x1, y1, base), (x1, y1, top), (x0, y0, top)]
+             for (x0, y0), (x1, y1) in zip(footprint, footprint[1:] + footprint[:1])]
+
+    return [bottom, roof] + walls
+
+L_SHAPE = [(0, 0), (3, 0), (3, 1), (1, 1), (1, 2), (0, 2)]
+
+PYRAMID = [
+    [(0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 0, 0)],
+    [(0, 0, 0), (1, 0, 0), (0.5, 0.5, 1)],
+    [(1, 0, 0), (1, 1, 0), (0.5, 0.5, 1)],
+    [(1, 1, 0), (0, 1, 0), (0.5, 0.5, 1)],
+    [(0, 1, 0), (0, 0, 0), (0.5, 0.5, 1)],
+]
+
+class TestPrism(unittest.TestCase):
+
+    def test_prism_volumes(self):
+        stepped = extrusion(L_SHAPE, 1)
+        stepped[1] = [(x, y, 1 + x) for x, y, _ in stepped[1]]
+        shapes = [CUBE, extrusion(L_SHAPE, 2.5, base=40), PYRAMID, stepped]
+
+        points, offsets, face_offsets = pack_polygons(
+            [multipolygon_wkb(rings) for rings in shapes])
+        connectivity = np.arange(len(points))
+        groups = np.repeat(np.arange(4), np.diff(face_offsets))
+        vector_areas = face_vector_areas(points, offsets, connectivity)
+
+        volumes = prism_volumes(points, offsets, connectivity, groups, 4,
+                                vector_areas)
+
+        np.testing.assert_allclose(volumes[:2], [1, 10])
+        self.assertTrue(np.isnan(volumes[2:]).all())
+
+    def test_matches_signed_volume(self):
+        # Closed prisms, far from the origin too, get their analytic volume,
+        # which has to be the signed volume of the faces
+        shapes = [CUBE, extrusion(L_SHAPE, 2.5),
+                  [[(x + 85000, y + 445000, z + 3) for x, y, z in ring]
+                   for ring in extrusion(L_SHAPE, 7.25)]]
+
+        for rings in shapes:
+            mesh = SurfaceMesh.from_wkb(multipolygon_wkb(rings))
+            self.assertIsNotNone(mesh.prism_volume())
+
+            points, offsets = mesh.points(), mesh.offsets()
+            self.assertAlmostEqual(
+                mesh.volume(), abs(signed_volume(points - points.mean(axis=0),
+                                                 offsets, mesh.connectivity())))
+
+    def test_topology_decides(self):
+        # Only closed, consistently oriented shells use the detector: open
+        # boxes, T-junctions and flipped walls go through the general path
+        rings = extrusion(L_SHAPE, 1)
+        split = [[(0, 0, 0), (2, 0, 0), (2, 0, 1), (0, 0, 1)],
+                 [(2, 0, 0), (3, 0, 0), (3, 0, 1), (2, 0, 1)]]
+        flipped = rings[:2] + [rings[2][::-1]] + rings[3:]
+        shapes = [rings[:-1], rings[:2] + split + rings[3:], flipped]
+
+        for shape in shapes:
+            mesh = SurfaceMesh.from_wkb(multipolygon_wkb(shape))
+            points, offsets = pack_polygons([multipolygon_wkb(shape)])[:2]
+
+            self.assertIsNone(mesh.prism_volume())
+            self.assertAlmostEqual(mesh.volume(), abs(signed_volume(
+                points, offsets, np.arange(len(points)))))
+
+    def test_batch_matches_meshes(self):
+        rings = extrusion(L_SHAPE, 1)
+        shapes = [CUBE, extrusion(L_SHAPE, 2.5), PYRAMID, rings[:-1],
+                  rings[:2] + [rings[2][::-1]] + rings[3:], []]
+        wkbs = [multipolygon_wkb(shape) for shape in shapes]
+
+        batch = SurfaceBatch.from_wkbs(wkbs, 1e-3)
+        points, offsets, face_offsets = pack_polygons(wkbs)
+        general = np.abs(signed_volumes(
+            points, offsets, np.arange(len(points)),
+            np.repeat(np.arange(len(wkbs)), np.diff(face_offsets)), len(wkbs)))
+
+        np.testing.assert_allclose(batch.volumes(), general)
+        np.testing.assert_allclose(
+            batch.volumes()[:5],
+            [SurfaceMesh.from_wkb(wkb, 1e-3).volume() for wkb in wkbs[:5]])
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestPrism)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,52 @@
+import time
+import unittest
+
+from ..processing.profiling import StageProfiler
+
+class TestProfiling(unittest.TestCase):
+
+    def test_nested_stages(self):
+        profiler = StageProfiler()
+
+        with profiler.stage('outer'):
+            with profiler.stage('inner'):
+                time.sleep(0.01)
+        with profiler.stage('inner'):
+            pass
+
+        stages = profiler.results()['stages']
+        self.assertEqual(stages['inner']['calls'], 2)
+        self.assertGreaterEqual(stages['inner']['seconds'], 0.01)
+        self.assertLess(stages['outer']['seconds'], stages['inner']['seconds'])
+        self.assertAlmostEqual(profiler.elapsed(),
+                               stages['outer']['seconds'] + stages['inner']['seconds'])
+
+    def test_features(self):
+        profiler = StageProfiler(top=2)
+        profiler.features([1, 2, 3], [100, 300, 200], [0.0, 0.1, 0.2])
+        profiler.features([4], [50])
+
+        results = profiler.results()
+        self.assertEqual(results['largest'], [{'id': 2, 'size': 300},
+                                              {'id': 3, 'size': 200}])
+        self.assertEqual(results['slowest'], [{'id': 3, 'seconds': 0.2},
+                                              {'id': 2, 'seconds': 0.1}])
+
+        # Features that are not timed on their own are never the slowest
+        profiler = StageProfiler()
+        profiler.features([1, 2], [100, 300])
+        self.assertEqual(profiler.results()['slowest'], [])
+
+    def test_disabled(self):
+        profiler = StageProfiler(enabled=False)
+
+        with profiler.stage('stage'):
+            pass
+        self.assertEqual(list(profiler.iterate('stage', [1, 2])), [1, 2])
+
+        self.assertEqual(profiler.results()['stages'], {})
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestProfiling)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
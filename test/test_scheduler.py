@@ -0,0 +1,90 @@
+import unittest
+
+from qgis.core import (QgsFeature,
+                       QgsGeometry,
+                       QgsProject,
+                       QgsVectorLayer,
+                       QgsVectorLayerFeatureSource)
+
+from .utilities import get_qgis_app
+QGIS_APP = get_qgis_app()
+
+from ..scheduler import ChunkTask, MetricsTask
+from .test_wkb import CUBE, multipolygon_wkb
+
+def cube_layer(count):
+    """Returns a memory layer with `count` unit cubes and an empty geometry"""
+    layer = QgsVectorLayer("MultiPolygonZ?crs=EPSG:28992", "cubes", "memory")
+
+    features = []
+    for i in range(count + 1):
+        geometry = QgsGeometry()
+        if i < count:
+            geometry.fromWkb(multipolygon_wkb(CUBE))
+
+        feature = QgsFeature()
+        feature.setGeometry(geometry)
+        features.append(feature)
+    layer.dataProvider().addFeatures(features)
+
+    return layer
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.layer = cube_layer(3)
+        QgsProject.instance().addMapLayer(self.layer)
+
+    def tearDown(self):
+        QgsProject.instance().removeMapLayer(self.layer.id())
+
+    def test_chunk_task(self):
+        fids = sorted(self.layer.allFeatureIds())
+        task = ChunkTask(QgsVectorLayerFeatureSource(self.layer), fids,
+                         ["volume", "holes"], chunk_size=3)
+
+        chunks = []
+        task.chunkComputed.connect(chunks.append)
+
+        self.assertTrue(task.compute())
+        self.assertEqual([sorted(chunk) for chunk in chunks], [fids[:3], fids[3:]])
+        self.assertEqual(chunks[0][fids[0]], {"volume": 1.0, "holes": 0})
+        self.assertIsNone(chunks[1][fids[3]])
+
+    def test_write_chunks(self):
+        task = MetricsTask(self.layer, ["volume", "is_solid"], chunk_size=2)
+        fields = self.layer.fields()
+        self.assertGreaterEqual(fields.lookupField("volume"), 0)
+        self.assertGreaterEqual(fields.lookupField("is_solid"), 0)
+
+        fids = sorted(self.layer.allFeatureIds())
+        task.writeChunk({fids[0]: {"volume": 1.0, "is_solid": True},
+                         fids[3]: None})
+        task.finished(True)
+
+        self.assertEqual(task.written, 2)
+        self.assertIsNone(task.error)
+        feature = self.layer.getFeature(fids[0])
+        self.assertEqual(feature["volume"], 1.0)
+        self.assertTrue(feature["is_solid"])
+
+        # Chunks are not written once the layer is being edited
+        self.layer.startEditing()
+        task.writeChunk({fids[1]: {"volume": 1.0, "is_solid": True}})
+        self.layer.rollBack()
+
+        self.assertEqual(task.written, 2)
+        self.assertIsNotNone(task.error)
+
+    def test_refuse_edit_mode(self):
+        self.layer.startEditing()
+        try:
+            with self.assertRaises(ValueError):
+                MetricsTask(self.layer, ["volume"])
+        finally:
+            self.layer.rollBack()
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestScheduler)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
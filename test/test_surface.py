@@ -0,0 +1,111 @@
+import unittest
+
+import numpy as np
+
+from ..core.surface import SurfaceBatch, SurfaceMesh, compute_metrics
+from .test_wkb import CUBE, multipolygon_wkb
+
+class TestSurface(unittest.TestCase):
+
+    def test_metrics(self):
+        mesh = SurfaceMesh.from_wkb(multipolygon_wkb(CUBE))
+
+        self.assertAlmostEqual(mesh.volume(), 1)
+        self.assertAlmostEqual(mesh.area(), 6)
+        self.assertTrue(mesh.isSolid())
+        self.assertEqual(mesh.z_range(), (0, 1))
+        self.assertEqual(len(mesh.points()), 8)
+
+    def test_welding(self):
+        # The top face is slightly off, so the cube only closes when the
+        # vertices are welded
+        rings = CUBE[:1] + [[(x, y, z + 1e-4) for x, y, z in CUBE[1]]] + CUBE[2:]
+        wkb = multipolygon_wkb(rings)
+
+        self.assertFalse(SurfaceMesh.from_wkb(wkb).isSolid())
+
+        mesh = SurfaceMesh.from_wkb(wkb, tolerance=1e-3)
+        self.assertTrue(mesh.isSolid())
+
+        # The tolerance can be changed afterwards
+        mesh.clean(None)
+        self.assertEqual(mesh.num_of_holes(), 2)
+
+    def test_holes(self):
+        mesh = SurfaceMesh.from_wkb(multipolygon_wkb(CUBE[:5]))
+
+        self.assertFalse(mesh.isSolid())
+        self.assertEqual(mesh.num_of_holes(), 1)
+
+        loop_offsets, loop_connectivity = mesh.hole_loops()
+        self.assertEqual(loop_offsets.tolist(), [0, 5])
+        self.assertEqual(loop_connectivity[0], loop_connectivity[-1])
+
+    def test_t_junction(self):
+        # A wall split at mid-edge leaves its neighbours with open edges
+        split = [[(0, 0, 0), (0.5, 0, 0), (0.5, 0, 1), (0, 0, 1)],
+                 [(0.5, 0, 0), (1, 0, 0), (1, 0, 1), (0.5, 0, 1)]]
+        mesh = SurfaceMesh.from_wkb(multipolygon_wkb(CUBE[:2] + split + CUBE[3:]))
+
+        self.assertAlmostEqual(mesh.volume(), 1)
+        self.assertFalse(mesh.isSolid())
+        self.assertEqual(mesh.num_of_holes(), 2)
+
+    def test_batch_holes(self):
+        # Slivers along the rim of the open top collapse when welded, so they
+        # must not close the hole
+        rim = [(0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)]
+        slivers = [[a, (a[0] + 1e-4, a[1], a[2]), b]
+                   for a, b in zip(rim, rim[1:] + rim[:1])]
+        wkbs = [multipolygon_wkb(CUBE), multipolygon_wkb(CUBE[:1] + CUBE[2:]),
+                multipolygon_wkb(CUBE[:1] + CUBE[2:] + slivers)]
+
+        counts = SurfaceBatch.from_wkbs(wkbs, 1e-3).num_of_holes()
+        meshes = [SurfaceMesh.from_wkb(wkb, 1e-3) for wkb in wkbs]
+
+        self.assertEqual(counts.tolist(), [0, 1, 1])
+        self.assertEqual(counts.tolist(), [mesh.num_of_holes() for mesh in meshes])
+        self.assertEqual([count == 0 for count in counts],
+                         [mesh.isSolid() for mesh in meshes])
+
+    def test_batch_matches_meshes(self):
+        # The batched and the single-mesh metrics share the cache entries, so
+        # they have to agree, far from the origin too
+        far = [[(x + 85000, y + 445000, z) for x, y, z in ring] for ring in CUBE]
+        wkbs = [multipolygon_wkb(CUBE), multipolygon_wkb(far),
+                multipolygon_wkb(CUBE[:5]), multipolygon_wkb([])]
+
+        batch = SurfaceBatch.from_wkbs(wkbs, 1e-3)
+        meshes = [SurfaceMesh.from_wkb(wkb, 1e-3) for wkb in wkbs]
+
+        np.testing.assert_allclose(batch.volumes()[:3],
+                                   [mesh.volume() for mesh in meshes[:3]])
+        self.assertEqual(batch.num_of_holes()[:3].tolist(),
+                         [mesh.num_of_holes() for mesh in meshes[:3]])
+        self.assertEqual(batch.volumes()[3], 0)
+        self.assertTrue(meshes[3].isEmpty())
+
+    def test_compact(self):
+        offset = np.array([1e5, 4e5, 10.0])
+        rings = [[tuple(np.add(point, offset)) for point in ring] for ring in CUBE]
+        mesh = SurfaceMesh.from_wkb(multipolygon_wkb(rings))
+        self.assertTrue(mesh.isSolid())
+
+        before = mesh.nbytes()
+        mesh.compact(float32=True)
+
+        self.assertLess(mesh.nbytes(), before)
+        self.assertAlmostEqual(mesh.volume(), 1, places=5)
+        self.assertAlmostEqual(mesh.area(), 6, places=5)
+        self.assertTrue(mesh.isSolid())
+        np.testing.assert_allclose(mesh.z_range(), (10, 11))
+        np.testing.assert_allclose(mesh.points().min(axis=0), offset)
+
+    def test_empty(self):
+        self.assertTrue(SurfaceMesh(np.zeros((0, 3)), [0]).isEmpty())
+        self.assertIsNone(compute_metrics((np.zeros((0, 3)), [0])))
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestSurface)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
@@ -0,0 +1,124 @@
+import time
+import unittest
+
+import numpy as np
+
+from ..core.topology import (EdgeIndex, boundary_edges, boundary_loops,
+                             connected_labels, hole_counts,
+                             remove_degenerate_faces)
+from .test_kernels import CUBE_CONNECTIVITY
+
+def without_faces(*faces):
+    """Returns the offsets and connectivity of the cube without some faces"""
+    quads = np.delete(CUBE_CONNECTIVITY.reshape(-1, 4), faces, axis=0)
+
+    return np.arange(0, len(quads) * 4 + 1, 4), quads.ravel()
+
+class TestTopology(unittest.TestCase):
+
+    def test_closed(self):
+        offsets, connectivity = without_faces()
+
+        self.assertEqual(len(boundary_edges(offsets, connectivity)[0]), 0)
+        self.assertEqual(hole_counts(offsets, connectivity,
+                                     np.zeros(6, dtype=int), 1).tolist(), [0])
+
+    def test_one_hole(self):
+        # A missing face has four open edges but is a single hole
+        offsets, connectivity = without_faces(1)
+        loop_offsets, loop_connectivity = boundary_loops(offsets, connectivity)
+
+        self.assertEqual(hole_counts(offsets, connectivity,
+                                     np.zeros(5, dtype=int), 1).tolist(), [1])
+        self.assertEqual(loop_offsets.tolist(), [0, 5])
+        self.assertEqual(loop_connectivity[0], loop_connectivity[-1])
+        self.assertEqual(sorted(loop_connectivity[:-1]), [4, 5, 6, 7])
+
+    def test_two_holes(self):
+        # The top and the bottom face are missing
+        offsets, connectivity = without_faces(0, 1)
+
+        self.assertEqual(len(boundary_loops(offsets, connectivity)[0]), 3)
+        self.assertEqual(hole_counts(offsets, connectivity,
+                                     np.zeros(4, dtype=int), 1).tolist(), [2])
+
+    def test_touching_holes(self):
+        # A 2x2x1 box with the top split in four quads, two of them, on a
+        # diagonal, missing: the holes touch at the centre of the top
+        points = [(x, y, z) for z in (0, 1) for y in (0, 1, 2) for x in (0, 1, 2)]
+        def at(x, y, z):
+            return points.index((x, y, z))
+
+        quads = [[at(x, y, 0), at(x, y + 1, 0), at(x + 1, y + 1, 0),
+                  at(x + 1, y, 0)] for x in (0, 1) for y in (0, 1)]
+        quads += [[at(1, 0, 1), at(2, 0, 1), at(2, 1, 1), at(1, 1, 1)],
+                  [at(0, 1, 1), at(1, 1, 1), at(1, 2, 1), at(0, 2, 1)]]
+        corners = [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2), (1, 2), (0, 2), (0, 1)]
+        for (x0, y0), (x1, y1) in zip(corners, corners[1:] + corners[:1]):
+            quads.append([at(x0, y0, 0), at(x1, y1, 0), at(x1, y1, 1),
+                          at(x0, y0, 1)])
+        offsets = np.arange(0, len(quads) * 4 + 1, 4)
+        connectivity = np.ravel(quads)
+
+        index = EdgeIndex(offsets, connectivity)
+        loop_offsets, loop_connectivity = index.boundary_loops()
+
+        self.assertTrue(index.isOriented())
+        self.assertEqual(index.hole_counts(np.zeros(len(quads), dtype=int),
+                                           1).tolist(), [2])
+        self.assertEqual(loop_offsets.tolist(), [0, 5, 10])
+        for start, end in zip(loop_offsets[:-1], loop_offsets[1:]):
+            loop = loop_connectivity[start:end]
+            self.assertEqual(loop[0], loop[-1])
+            self.assertIn(at(1, 1, 1), loop)
+
+    def test_edge_index(self):
+        index = EdgeIndex(*without_faces())
+
+        self.assertEqual(len(index.counts), 12)
+        self.assertTrue(index.isManifold())
+        self.assertTrue(index.isOriented())
+        self.assertEqual(index.shells().tolist(), [0] * 6)
+
+    def test_edge_index_flipped_face(self):
+        offsets, connectivity = without_faces()
+        quads = connectivity.reshape(-1, 4).copy()
+        quads[2] = quads[2, ::-1]
+
+        index = EdgeIndex(offsets, quads.ravel())
+
+        self.assertEqual(index.n_open_edges(), 0)
+        self.assertFalse(index.isOriented())
+
+    def test_shells(self):
+        # Two cubes that do not touch
+        offsets, connectivity = without_faces()
+        offsets = np.arange(0, 49, 4)
+        connectivity = np.concatenate([connectivity, connectivity + 8])
+
+        self.assertEqual(EdgeIndex(offsets, connectivity).shells().tolist(),
+                         [0] * 6 + [1] * 6)
+
+    def test_connected_labels_long_path(self):
+        # A long path with shuffled node numbers, and one isolated node: the
+        # path took 44 s when labels only moved one link per round
+        path = np.random.default_rng(0).permutation(100000)
+
+        start = time.perf_counter()
+        labels = connected_labels(100001, path[:-1], path[1:])
+
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(np.bincount(labels).tolist(), [100000, 1])
+        self.assertEqual(labels[100000], 1)
+
+    def test_remove_degenerate_faces(self):
+        offsets, connectivity = remove_degenerate_faces(
+            [0, 4, 8, 11], [0, 0, 1, 2, 3, 4, 4, 3, 5, 5, 5])
+
+        self.assertEqual(offsets.tolist(), [0, 3])
+        self.assertEqual(connectivity.tolist(), [0, 1, 2])
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestTopology)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
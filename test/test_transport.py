@@ -0,0 +1,54 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ..core.transport import SharedArrays, shared_chunk_volumes, share_chunk, shared_volumes
+from .test_wkb import CUBE, multipolygon_wkb
+
+class TestTransport(unittest.TestCase):
+
+    def test_shared_arrays(self):
+        points = np.arange(12, dtype=float).reshape(4, 3)
+        shared = SharedArrays.create({'points': points},
+                                     {'result': (np.int32, 3)})
+
+        try:
+            with SharedArrays.attach(shared.descriptor()) as attached:
+                np.testing.assert_array_equal(attached['points'], points)
+                attached['result'][:] = [1, 2, 3]
+
+            self.assertEqual(shared['result'].tolist(), [1, 2, 3])
+        finally:
+            shared.unlink()
+
+    def test_shared_chunk_volumes(self):
+        moved = [[(x + 10, y, z) for x, y, z in ring] for ring in CUBE]
+        wkbs = [multipolygon_wkb(CUBE), b'', multipolygon_wkb(moved)]
+        shared = share_chunk(wkbs)
+
+        try:
+            # The block carries the raw WKB, which the worker decodes
+            self.assertEqual(shared['wkb'].tobytes(), b''.join(wkbs))
+            self.assertEqual(shared['starts'].tolist(),
+                             [0, len(wkbs[0]), len(wkbs[0]),
+                              len(wkbs[0]) + len(wkbs[2])])
+            self.assertEqual(shared_chunk_volumes(shared.descriptor()), 2)
+            self.assertEqual(shared['volumes'].tolist(), [1, 0, 1])
+        finally:
+            shared.unlink()
+
+    def test_shared_volumes(self):
+        items = ((i, ([multipolygon_wkb(CUBE)] * i,)) for i in range(4))
+
+        with ThreadPoolExecutor(2) as executor:
+            results = list(shared_volumes(executor, items, 2))
+
+        self.assertEqual([chunk for chunk, _ in results], [0, 1, 2, 3])
+        self.assertEqual(results[3][1][0].tolist(), [1, 1, 1])
+        self.assertEqual(results[0][1][0].tolist(), [])
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestTransport)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
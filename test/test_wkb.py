@@ -0,0 +1,96 @@
+import struct
+import unittest
+
+import numpy as np
+
+from ..core.wkb import (decode_polygons, encode_multilinestring,
+                        encode_multipolygon, pack_polygons, vtk_faces)
+
+def multipolygon_wkb(rings, code=1006, byteorder='<'):
+    """Returns the WKB of a multipolygon with one (closed) ring per polygon"""
+    flag = 1 if byteorder == '<' else 0
+    dims = 3 if code // 1000 in (1, 2) else (4 if code > 3000 else 2)
+
+    wkb = struct.pack(byteorder + 'BII', flag, code, len(rings))
+    for ring in rings:
+        ring = list(ring) + [ring[0]]
+        wkb += struct.pack(byteorder + 'BIII', flag, code - 3, 1, len(ring))
+        for point in ring:
+            wkb += struct.pack(byteorder + 'd' * dims, *point[:dims])
+
+    return wkb
+
+CUBE = [
+    [(0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 0, 0)],
+    [(0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)],
+    [(0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1)],
+    [(1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1)],
+    [(1, 1, 0), (0, 1, 0), (0, 1, 1), (1, 1, 1)],
+    [(0, 1, 0), (0, 0, 0), (0, 0, 1), (0, 1, 1)],
+]
+
+class TestWkb(unittest.TestCase):
+
+    def test_decode_polygons(self):
+        points, offsets = decode_polygons(multipolygon_wkb(CUBE))
+
+        self.assertEqual(points.shape, (24, 3))
+        self.assertEqual(offsets.tolist(), [0, 4, 8, 12, 16, 20, 24])
+        np.testing.assert_array_equal(points[4:8], CUBE[1])
+
+    def test_decode_big_endian(self):
+        points, offsets = decode_polygons(multipolygon_wkb(CUBE, byteorder='>'))
+
+        self.assertEqual(offsets.tolist(), [0, 4, 8, 12, 16, 20, 24])
+        np.testing.assert_array_equal(points[:4], CUBE[0])
+
+    def test_decode_2d(self):
+        points, _ = decode_polygons(multipolygon_wkb(CUBE[:1], code=6))
+
+        np.testing.assert_array_equal(points[:, 2], 0)
+
+    def test_decode_empty(self):
+        points, offsets = decode_polygons(b'')
+
+        self.assertEqual(len(points), 0)
+        self.assertEqual(offsets.tolist(), [0])
+
+    def test_decode_unsupported(self):
+        with self.assertRaises(ValueError):
+            decode_polygons(struct.pack('<BIddd', 1, 1001, 0, 0, 0))
+
+    def test_pack_polygons(self):
+        point = struct.pack('<BIddd', 1, 1001, 0, 0, 0)
+        wkbs = [multipolygon_wkb(CUBE), b'', point, multipolygon_wkb(CUBE[:2])]
+
+        points, offsets, face_offsets = pack_polygons(wkbs)
+
+        self.assertEqual(points.shape, (32, 3))
+        self.assertEqual(len(offsets), 9)
+        self.assertEqual(face_offsets.tolist(), [0, 6, 6, 6, 8])
+
+    def test_encode_multilinestring(self):
+        points = np.arange(15, dtype=float).reshape(5, 3)
+        wkb = encode_multilinestring(points, [0, 2, 5], [4, 0, 1, 2, 3])
+
+        self.assertEqual(len(wkb), 9 + 2 * 9 + 5 * 24)
+        self.assertEqual(struct.unpack_from('<BII', wkb), (1, 1005, 2))
+        self.assertEqual(struct.unpack_from('<BII', wkb, 9), (1, 1002, 2))
+        self.assertEqual(struct.unpack_from('<6d', wkb, 18),
+                         (12, 13, 14, 0, 1, 2))
+        self.assertEqual(struct.unpack_from('<BII', wkb, 66), (1, 1002, 3))
+
+    def test_encode_multipolygon(self):
+        wkb = encode_multipolygon(np.concatenate(CUBE), np.arange(0, 25, 4))
+
+        self.assertEqual(wkb, multipolygon_wkb(CUBE))
+
+    def test_vtk_faces(self):
+        faces = vtk_faces(np.array([0, 3, 7]))
+
+        self.assertEqual(faces.tolist(), [3, 0, 1, 2, 4, 3, 4, 5, 6])
+
+if __name__ == "__main__":
+    suite = unittest.makeSuite(TestWkb)
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite)
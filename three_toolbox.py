@@ -33,17 +33,21 @@ __revision__ = '$Format:%H$'
 import os
 import sys
 import inspect
+from importlib.util import find_spec
 
-from qgis.core import QgsExpression, QgsApplication
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.PyQt.QtWidgets import QAction
+from qgis.core import QgsExpression, QgsApplication, QgsVectorLayer
 from .processing.three_toolbox_provider import ThreeToolboxProvider
+from .scheduler import FIELD_TYPES, MetricsScheduler
+from .settings import scheduler_metrics, scheduler_workers
 
-try:
-    import pyvista
-    from .functions import *
+# pyvista (and VTK with it) takes seconds to import, so they are only looked
+# up here and imported the first time a mesh needs them
+has_pyvista = all(find_spec(name) is not None for name in ('pyvista', 'vtk'))
 
-    has_pyvista = True
-except ImportError:
-    has_pyvista = False
+if has_pyvista:
+    from .functions import *
 
 cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
 
@@ -52,8 +56,13 @@ if cmd_folder not in sys.path:
 
 class ThreeToolboxPlugin(object):
 
-    def __init__(self):
+    MENU = '&3D Toolbox'
+
+    def __init__(self, iface=None):
+        self.iface = iface
         self.provider = None
+        self.scheduler = None
+        self.metrics_action = None
 
     def initProcessing(self):
         """Init Processing provider for QGIS >= 3.8."""
@@ -63,15 +72,70 @@ class ThreeToolboxPlugin(object):
     def initGui(self):
         self.initProcessing()
 
+        # Computes metrics over whole layers in the background, e.g. with
+        # plugin.scheduler.submit(layer, ['volume', 'area'])
+        self.scheduler = MetricsScheduler(workers=scheduler_workers())
+
+        if self.iface is not None:
+            self.metrics_action = QAction(
+                self.tr('Compute 3D metrics in the background'),
+                self.iface.mainWindow())
+            self.metrics_action.triggered.connect(self.submitActiveLayer)
+            self.iface.addPluginToVectorMenu(self.MENU, self.metrics_action)
+
         if has_pyvista:
             QgsExpression.registerFunction(volume)
             QgsExpression.registerFunction(is_solid)
             QgsExpression.registerFunction(surface_area)
             QgsExpression.registerFunction(slope)
+            QgsExpression.registerFunction(metrics_3d)
 
     def unload(self):
         QgsApplication.processingRegistry().removeProvider(self.provider)
+        if self.metrics_action is not None:
+            self.iface.removePluginVectorMenu(self.MENU, self.metrics_action)
+            self.metrics_action = None
+        if self.scheduler is not None:
+            self.scheduler.shutdown()
         QgsExpression.unregisterFunction('volume')
         QgsExpression.unregisterFunction('is_solid')
         QgsExpression.unregisterFunction('surface_area')
         QgsExpression.unregisterFunction('slope')
+        QgsExpression.unregisterFunction('metrics_3d')
+
+    def submitActiveLayer(self):
+        """Computes the metrics of the `three_toolbox/scheduler_metrics`
+        setting over the active layer (its selected features only, if any)
+        in the background"""
+        layer = self.iface.activeLayer()
+        if not isinstance(layer, QgsVectorLayer):
+            self.iface.messageBar().pushWarning(
+                self.tr('3D Toolbox'),
+                self.tr('Select a vector layer to compute its 3D metrics'))
+            return
+
+        names = [name for name in scheduler_metrics() if name in FIELD_TYPES]
+        if not names:
+            self.iface.messageBar().pushWarning(
+                self.tr('3D Toolbox'),
+                self.tr('No known metric in the scheduler_metrics setting'))
+            return
+
+        try:
+            task = self.scheduler.submit(layer, names, selected_only=
+                                         layer.selectedFeatureCount() > 0)
+        except ValueError as error:
+            self.iface.messageBar().pushWarning(self.tr('3D Toolbox'), str(error))
+            return
+
+        message = self.tr('The 3D metrics of {} were not written').format(
+            layer.name())
+        task.taskTerminated.connect(lambda: self.iface.messageBar().pushWarning(
+            self.tr('3D Toolbox'), task.error or message))
+        self.iface.messageBar().pushInfo(
+            self.tr('3D Toolbox'),
+            self.tr('Computing {} of {} in the background').format(
+                ', '.join(names), layer.name()))
+
+    def tr(self, string):
+        return QCoreApplication.translate('ThreeToolbox', string)